@@ -26,8 +26,8 @@ The execute() function kicks off the import process.
 The python module loadldraw does the actual work.
 """
 
-import configparser
 import os
+import re
 import bpy
 from bpy.props import (StringProperty,
                        FloatProperty,
@@ -37,6 +37,12 @@ from bpy.props import (StringProperty,
 from bpy_extras.io_utils import ImportHelper
 from .loadldraw import loadldraw
 
+# Paths of files and folders shipped with the add-on
+addonDirectory    = os.path.dirname(__file__)
+prefsFilepath     = os.path.join(addonDirectory, "ImportLDrawPreferences.ini")
+lsynthDirectory   = os.path.join(addonDirectory, "lsynth")
+studLogoDirectory = os.path.join(addonDirectory, "studs")
+
 """
 Example preferences file:
 
@@ -67,43 +73,170 @@ class Preferences():
     """Import LDraw - Preferences"""
     __sectionName   = 'importldraw'
 
+    # The preferences file only holds simple 'option = value' lines, so we
+    # read and write it ourselves rather than use configparser.
+    __sectionRegex  = re.compile(r"^\s*\[([^\]]+)\]\s*$")
+    __optionRegex   = re.compile(r"^\s*([^=:;#\s][^=:]*?)\s*[=:]\s*(.*?)\s*$")
+    __booleanStates = {
+        '1': True,  'yes': True,  'true': True,  'on': True,
+        '0': False, 'no': False,  'false': False, 'off': False
+    }
+
+    def __toBoolean(text):
+        if text.lower() not in Preferences.__booleanStates:
+            raise ValueError("Not a boolean: {0}".format(text))
+        return Preferences.__booleanStates[text.lower()]
+
+    # How to convert an option's text, keyed by the type of its default value
+    __converters    = {
+        bool:  __toBoolean,
+        float: float,
+        int:   int,
+    }
+
+    def __readValues(filepath):
+        """Reads the text of each option in our section of the preferences file.
+        Option names are case insensitive, so are stored in lower case.
+        Lines outside our section are returned unchanged, along with the index in them
+        where our section was, so that saving keeps them in their original order."""
+        values = {}
+        otherLines = []
+        sectionIndex = None
+        try:
+            with open(filepath, "rt") as prefsFile:
+                lines = prefsFile.read().splitlines()
+        except OSError:
+            return values, otherLines, sectionIndex
+
+        sectionName = None
+        for line in lines:
+            match = Preferences.__sectionRegex.match(line)
+            if match is not None:
+                sectionName = match.group(1)
+                if sectionName != Preferences.__sectionName:
+                    otherLines.append(line)
+                elif sectionIndex is None:
+                    sectionIndex = len(otherLines)
+            elif sectionName == Preferences.__sectionName:
+                match = Preferences.__optionRegex.match(line)
+                if match is not None:
+                    values[match.group(1).lower()] = match.group(2)
+            else:
+                otherLines.append(line)
+
+        return values, otherLines, sectionIndex
+
     def __init__(self):
         self.__ldPath        = None
-        self.__prefsPath     = os.path.dirname(__file__)
-        self.__prefsFilepath = os.path.join(self.__prefsPath, "ImportLDrawPreferences.ini")
-        self.__config        = configparser.RawConfigParser()
-        self.__prefsRead     = self.__config.read(self.__prefsFilepath)
-        if self.__prefsRead and not self.__config[Preferences.__sectionName]:
-            self.__prefsRead = False
+        self.__prefsPath     = addonDirectory
+        self.__prefsFilepath = prefsFilepath
+        self.__values, self.__otherLines, self.__sectionIndex = Preferences.__readValues(self.__prefsFilepath)
+
+        # Values already converted to their proper type, keyed by option name
+        self.__snapshot      = {}
+
+        # Have any values changed since the file was read or saved?
+        self.__dirty         = False
 
     def get(self, option, default):
-        if not self.__prefsRead:
+        # Reuse the value converted by an earlier call if we have one
+        value = self.__snapshot.get(option)
+        if type(value) is type(default):
+            return value
+
+        text = self.__values.get(option.lower())
+        if text is None:
             return default
 
-        if type(default) is bool:
-            return self.__config.getboolean(Preferences.__sectionName, option, fallback=default)
-        elif type(default) is float:
-            return self.__config.getfloat(Preferences.__sectionName, option, fallback=default)
-        elif type(default) is int:
-            return self.__config.getint(Preferences.__sectionName, option, fallback=default)
-        else:
-            return self.__config.get(Preferences.__sectionName, option, fallback=default)
+        # Convert according to the type of the default value
+        value = Preferences.__converters.get(type(default), str)(text)
+        self.__snapshot[option] = value
+        return value
 
     def set(self, option, value):
-        if not (Preferences.__sectionName in self.__config):
-            self.__config[Preferences.__sectionName] = {}
-        self.__config[Preferences.__sectionName][option] = str(value)
+        self.__snapshot[option] = value
+
+        text = str(value)
+        if self.__values.get(option.lower()) != text:
+            self.__values[option.lower()] = text
+            self.__dirty = True
 
     def save(self):
+        """Write the preferences file. Returns None, or a warning message if it couldn't be written."""
+
+        # Don't rewrite the file if nothing has changed
+        if not self.__dirty:
+            return None
+
+        # Build the whole file in memory and write it in one go, keeping any other
+        # sections where they were. Our section goes at the end if it is new.
+        sectionIndex = self.__sectionIndex
+        if sectionIndex is None:
+            sectionIndex = len(self.__otherLines)
+        lines = self.__otherLines[:sectionIndex]
+        if lines and lines[-1].strip():
+            lines.append("")
+        lines.append("[{0}]".format(Preferences.__sectionName))
+        lines.extend("{0} = {1}".format(option, value) for option, value in self.__values.items())
+        if sectionIndex < len(self.__otherLines):
+            lines.append("")
+            lines.extend(self.__otherLines[sectionIndex:])
+
+        # End the file with a single newline
+        while lines and not lines[-1].strip():
+            lines.pop()
+
         try:
             with open(self.__prefsFilepath, 'w') as configfile:
-                self.__config.write(configfile)
-            return True
-        except Exception:
-            # Fail gracefully
-            e = sys.exc_info()[0]
-            debugPrint("WARNING: Could not save preferences. {0}".format(e))
-            return False
+                configfile.write("\n".join(lines) + "\n")
+            self.__dirty = False
+            return None
+        except Exception as e:
+            # Fail gracefully, the caller reports the problem
+            return "Could not save preferences. {0!r}".format(e)
+
+
+# Import options that are remembered in the preferences file, other than
+# ldrawDirectory and realGapWidth which need special handling.
+# Each entry is (preference name, operator property, loadldraw.Options name).
+# The option name is None for values that are not copied straight into loadldraw.Options.
+# The default value of each is the default of its operator property.
+importFields = (
+    ("realScale",                      "realScale",              "realScale"),
+    ("resolution",                     "resPrims",               "resolution"),
+    ("smoothShading",                  "smoothParts",            "smoothShading"),
+    ("bevelEdges",                     "bevelEdges",             None),
+    ("bevelWidth",                     "bevelWidth",             "bevelWidth"),
+    ("useLook",                        "look",                   None),
+    ("useColourScheme",                "colourScheme",           "useColourScheme"),
+    ("gaps",                           "addGaps",                "gaps"),
+    ("curvedWalls",                    "curvedWalls",            "curvedWalls"),
+    ("importCameras",                  "importCameras",          "importCameras"),
+    ("linkParts",                      "linkParts",              "createInstances"),
+    ("numberNodes",                    "numberNodes",            "numberNodes"),
+    ("positionObjectOnGroundAtOrigin", "positionOnGround",       "positionObjectOnGroundAtOrigin"),
+    ("flattenHierarchy",               "flatten",                "flattenHierarchy"),
+    ("minifigHierarchy",               "minifigHierarchy",       "minifigHierarchy"),
+    ("useUnofficialParts",             "useUnofficialParts",     "useUnofficialParts"),
+    ("useLogoStuds",                   "useLogoStuds",           "useLogoStuds"),
+    ("instanceStuds",                  "instanceStuds",          "instanceStuds"),
+    ("resolveNormals",                 "resolveNormals",         "resolveAmbiguousNormals"),
+    ("addEnvironment",                 "addEnvironment",         "addWorldEnvironmentTexture"),
+    ("positionCamera",                 "positionCamera",         "positionCamera"),
+    ("cameraBorderPercentage",         "cameraBorderPercentage", None),
+)
+
+# loadldraw.Options that are always the same for the importer
+fixedOptions = {
+    "defaultColour":              "4",
+    "removeDoubles":              True,
+    "logoStudVersion":            "4",
+    "useLSynthParts":             True,
+    "LSynthDirectory":            lsynthDirectory,
+    "studLogoDirectory":          studLogoDirectory,
+    "overwriteExistingMaterials": False,
+    "overwriteExistingMeshes":    False,
+}
 
 
 class ImportLDrawOps(bpy.types.Operator, ImportHelper):
@@ -116,8 +249,8 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     bl_region_type  = "WINDOW"
     bl_options      = {'REGISTER', 'UNDO', 'PRESET'}
 
-    # Instance the preferences system
-    prefs = Preferences()
+    # The preferences system (instanced on first use, see getPreferences())
+    prefs = None
 
     # File type filter in file browser
     filename_ext = ".ldr"
@@ -129,19 +262,19 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     ldrawPath: StringProperty(
         name="",
         description="Full filepath to the LDraw Parts Library (download from http://www.ldraw.org)",
-        default=prefs.get("ldrawDirectory", loadldraw.Configure.findDefaultLDrawDirectory())
+        default=""
     )
 
     realScale: FloatProperty(
         name="Scale",
         description="Sets a scale for the model (1.0 = real life scale)",
-        default=prefs.get("realScale", 1.0)
+        default=1.0
     )
 
     resPrims: EnumProperty(
         name="Resolution of part primitives",
         description="Resolution of part primitives, ie. how much geometry they have",
-        default=prefs.get("resolution", "Standard"),
+        default="Standard",
         items=(
             ("Standard", "Standard primitives",        "Import using standard resolution primitives."),
             ("High",     "High resolution primitives", "Import using high resolution primitives."),
@@ -152,13 +285,13 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     smoothParts: BoolProperty(
         name="Smooth faces and edge-split",
         description="Smooth faces and add an edge-split modifier",
-        default=prefs.get("smoothShading", True)
+        default=True
     )
 
     look: EnumProperty(
         name="Overall Look",
         description="Realism or Schematic look",
-        default=prefs.get("useLook", "normal"),
+        default="normal",
         items=(
             ("normal", "Realistic Look", "Render to look realistic."),
             ("instructions", "Lego Instructions Look", "Render to look like the instruction book pictures."),
@@ -168,7 +301,7 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     colourScheme: EnumProperty(
         name="Colour scheme options",
         description="Colour scheme options",
-        default=prefs.get("useColurScheme", "lgeo"),
+        default="lgeo",
         items=(
             ("lgeo", "Realistic colours", "Uses the LGEO colour scheme for realistic colours."),
             ("ldraw", "Original LDraw colours", "Uses the standard LDraw colour scheme. Looks good with the Instructions Look."),
@@ -179,79 +312,79 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     addGaps: BoolProperty(
         name="Add space between each part:",
         description="Add a small space between each part",
-        default=prefs.get("gaps", False)
+        default=False
     )
 
     gapWidthMM: FloatProperty(
         name="Space",
         description="Amount of space between each part (default 0.2mm)",
-        default=1000 * prefs.get("realGapWidth", 0.0002)
+        default=0.2
     )
 
     curvedWalls: BoolProperty(
         name="Use curved wall normals",
         description="Makes surfaces look slightly concave, for interesting reflections",
-        default=prefs.get("curvedWalls", True)
+        default=True
     )
 
     importCameras: BoolProperty(
         name="Import cameras",
         description="Import camera definitions (from models authored in LeoCAD)",
-        default=prefs.get("importCameras", True)
+        default=True
     )
 
     linkParts: BoolProperty(
         name="Link identical parts",
         description="Identical parts (of the same type and colour) share the same mesh",
-        default=prefs.get("linkParts", True)
+        default=True
     )
 
     numberNodes: BoolProperty(
         name="Number each object",
         description="Each object has a five digit prefix eg. 00001_car. This keeps the list in it's proper order",
-        default=prefs.get("numberNodes", True)
+        default=True
     )
 
     positionOnGround: BoolProperty(
         name="Put model on ground at origin",
         description="The object is centred at the origin, and on the ground plane",
-        default=prefs.get("positionObjectOnGroundAtOrigin", True)
+        default=True
     )
 
     flatten: BoolProperty(
         name="Flatten tree",
         description="In Scene Outliner, all parts are placed directly below the root - there's no tree of submodels",
-        default=prefs.get("flattenHierarchy", False)
+        default=False
     )
 
     minifigHierarchy: BoolProperty(
         name="Parent Minifigs",
         description="Add a parent/child hierarchy (tree) for Minifigs",
-        default=prefs.get("minifigHierarchy", True)
+        default=True
     )
 
     useUnofficialParts: BoolProperty(
         name="Include unofficial parts",
         description="Additionally searches for parts in the <ldraw-dir>/unofficial/ directory",
-        default=prefs.get("useUnofficialParts", True)
+        default=True
     )
 
     useLogoStuds: BoolProperty(
         name="Show 'LEGO' logo on studs",
         description="Shows the LEGO logo on each stud (at the expense of some extra geometry and import time)",
-        default=prefs.get("useLogoStuds", False)
+        default=False
     )
 
     instanceStuds: BoolProperty(
         name="Make individual studs",
         description="Creates a Blender Object for each and every stud (WARNING: can be slow to import and edit in Blender if there are lots of studs)",
-        default=prefs.get("instanceStuds", False)
+        default=False
     )
 
     resolveNormals: EnumProperty(
         name="Resolve ambiguous normals option",
         description="Some older LDraw parts have faces with ambiguous normals, this specifies what do do with them",
-        default=prefs.get("resolveNormals", "guess"),
+        default="guess",
         items=(
             ("guess", "Recalculate Normals", "Uses Blender's Recalculate Normals to get a consistent set of normals."),
             ("double", "Two faces back to back", "Two faces are added with their normals pointing in opposite directions."),
@@ -261,33 +394,61 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     bevelEdges: BoolProperty(
         name="Bevel edges",
         description="Adds a Bevel modifier for rounding off sharp edges",
-        default=prefs.get("bevelEdges", True)
+        default=True
     )
 
     bevelWidth: FloatProperty(
         name="Bevel Width",
         description="Width of the bevelled edges",
-        default=prefs.get("bevelWidth", 0.5)
+        default=0.5
     )
 
     addEnvironment: BoolProperty(
         name="Add Environment",
         description="Adds a ground plane and environment texture (for realistic look only)",
-        default=prefs.get("addEnvironment", True)
+        default=True
     )
 
     positionCamera: BoolProperty(
         name="Position the camera",
         description="Position the camera to show the whole model",
-        default=prefs.get("positionCamera", True)
+        default=True
     )
 
     cameraBorderPercentage: FloatProperty(
         name="Camera Border %",
         description="When positioning the camera, include a (percentage) border leeway around the model in the rendered image",
-        default=prefs.get("cameraBorderPercentage", 5.0)
+        default=5.0
     )
 
+    @classmethod
+    def getPreferences(cls):
+        """Instance the preferences system the first time it is needed."""
+        if cls.prefs is None:
+            cls.prefs = Preferences()
+        return cls.prefs
+
+    def applyPreferences(self):
+        """Fill in each import option the caller has not set from the saved preferences."""
+
+        # Reading preferences is left until now, so that it doesn't slow down Blender startup
+        prefs = ImportLDrawOps.getPreferences()
+        isSet = self.properties.is_property_set
+        properties = self.bl_rna.properties
+        if not isSet("ldrawPath"):
+            self.ldrawPath = prefs.get("ldrawDirectory", loadldraw.Configure.findDefaultLDrawDirectory())
+        if not isSet("gapWidthMM"):
+            self.gapWidthMM = prefs.get("realGapWidth", properties["gapWidthMM"].default / 1000) * 1000
+        for prefName, propName, optionName in importFields:
+            if not isSet(propName):
+                setattr(self, propName, prefs.get(prefName, properties[propName].default))
+
+    def invoke(self, context, event):
+        """Read the import options from the preferences, then show the file browser."""
+
+        self.applyPreferences()
+        return ImportHelper.invoke(self, context, event)
+
     def draw(self, context):
         """Display import options."""
 
@@ -330,71 +491,36 @@ class ImportLDrawOps(bpy.types.Operator, ImportHelper):
     def execute(self, context):
         """Start the import process."""
 
-        # Read current preferences from the UI and save them
-        ImportLDrawOps.prefs.set("ldrawDirectory",        self.ldrawPath)
-        ImportLDrawOps.prefs.set("realScale",             self.realScale)
-        ImportLDrawOps.prefs.set("resolution",            self.resPrims)
-        ImportLDrawOps.prefs.set("smoothShading",         self.smoothParts)
-        ImportLDrawOps.prefs.set("bevelEdges",            self.bevelEdges)
-        ImportLDrawOps.prefs.set("bevelWidth",            self.bevelWidth)
-        ImportLDrawOps.prefs.set("useLook",               self.look)
-        ImportLDrawOps.prefs.set("useColourScheme",       self.colourScheme)
-        ImportLDrawOps.prefs.set("gaps",                  self.addGaps)
-        ImportLDrawOps.prefs.set("realGapWidth",          self.gapWidthMM / 1000)
-        ImportLDrawOps.prefs.set("curvedWalls",           self.curvedWalls)
-        ImportLDrawOps.prefs.set("importCameras",         self.importCameras)
-        ImportLDrawOps.prefs.set("linkParts",             self.linkParts)
-        ImportLDrawOps.prefs.set("numberNodes",           self.numberNodes)
-        ImportLDrawOps.prefs.set("positionObjectOnGroundAtOrigin", self.positionOnGround)
-        ImportLDrawOps.prefs.set("flattenHierarchy",      self.flatten)
-        ImportLDrawOps.prefs.set("minifigHierarchy",      self.minifigHierarchy)
-        ImportLDrawOps.prefs.set("useUnofficialParts",    self.useUnofficialParts)
-        ImportLDrawOps.prefs.set("useLogoStuds",          self.useLogoStuds)
-        ImportLDrawOps.prefs.set("instanceStuds",         self.instanceStuds)
-        ImportLDrawOps.prefs.set("resolveNormals",        self.resolveNormals)
-        ImportLDrawOps.prefs.set("addEnvironment",        self.addEnvironment)
-        ImportLDrawOps.prefs.set("positionCamera",        self.positionCamera)
-        ImportLDrawOps.prefs.set("cameraBorderPercentage",self.cameraBorderPercentage)
-        ImportLDrawOps.prefs.save()
+        # When run from a script invoke() is skipped, so fill in any options that were not given
+        self.applyPreferences()
 
         # Set bpy related variables here since it isn't available immediately on Blender startup
         loadldraw.hasCollections = hasattr(bpy.data, "collections")
 
-        # Set import options and import
+        for optionName, value in fixedOptions.items():
+            setattr(loadldraw.Options, optionName, value)
+
+        # Read current preferences from the UI, save them and set them as import options
+        prefs = ImportLDrawOps.getPreferences()
+        for prefName, propName, optionName in importFields:
+            value = getattr(self, propName)
+            prefs.set(prefName, value)
+            if optionName is not None:
+                setattr(loadldraw.Options, optionName, value)
+        prefs.set("ldrawDirectory",  self.ldrawPath)
+        prefs.set("realGapWidth",    self.gapWidthMM / 1000)
+        saveWarning = prefs.save()
+        if saveWarning is not None:
+            self.report({'WARNING'}, saveWarning)
+
+        # Options that are not covered by importFields
         loadldraw.Options.ldrawDirectory             = self.ldrawPath
-        loadldraw.Options.realScale                  = self.realScale
-        loadldraw.Options.useUnofficialParts         = self.useUnofficialParts
-        loadldraw.Options.resolution                 = self.resPrims
-        loadldraw.Options.defaultColour              = "4"
-        loadldraw.Options.createInstances            = self.linkParts
         loadldraw.Options.instructionsLook           = self.look == "instructions"
-        loadldraw.Options.useColourScheme            = self.colourScheme
-        loadldraw.Options.numberNodes                = self.numberNodes
-        loadldraw.Options.removeDoubles              = True
-        loadldraw.Options.smoothShading              = self.smoothParts
         loadldraw.Options.edgeSplit                  = self.smoothParts     # Edge split is appropriate only if we are smoothing
-        loadldraw.Options.gaps                       = self.addGaps
         loadldraw.Options.realGapWidth               = self.gapWidthMM / 1000
-        loadldraw.Options.curvedWalls                = self.curvedWalls
-        loadldraw.Options.importCameras              = self.importCameras
-        loadldraw.Options.positionObjectOnGroundAtOrigin = self.positionOnGround
-        loadldraw.Options.flattenHierarchy           = self.flatten
-        loadldraw.Options.minifigHierarchy           = self.minifigHierarchy
-        loadldraw.Options.useLogoStuds               = self.useLogoStuds
-        loadldraw.Options.logoStudVersion            = "4"
-        loadldraw.Options.instanceStuds              = self.instanceStuds
-        loadldraw.Options.useLSynthParts             = True
-        loadldraw.Options.LSynthDirectory            = os.path.join(os.path.dirname(__file__), "lsynth")
-        loadldraw.Options.studLogoDirectory          = os.path.join(os.path.dirname(__file__), "studs")
-        loadldraw.Options.resolveAmbiguousNormals    = self.resolveNormals
-        loadldraw.Options.overwriteExistingMaterials = False
-        loadldraw.Options.overwriteExistingMeshes    = False
         loadldraw.Options.addBevelModifier           = self.bevelEdges and not loadldraw.Options.instructionsLook
-        loadldraw.Options.bevelWidth                 = self.bevelWidth
-        loadldraw.Options.addWorldEnvironmentTexture = self.addEnvironment
-        loadldraw.Options.addGroundPlane             = self.addEnvironment
-        loadldraw.Options.positionCamera             = self.positionCamera
         loadldraw.Options.cameraBorderPercent        = self.cameraBorderPercentage / 100.0
+        loadldraw.Options.addGroundPlane             = self.addEnvironment
 
         loadldraw.loadFromFile(self, self.filepath)
         return {'FINISHED'}
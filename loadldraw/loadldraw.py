@@ -29,6 +29,7 @@ Accepts .io, .mpd, .ldr, .l3b, and .dat files.
 Toby Nelson - tobymnelson@gmail.com
 """
 
+import io
 import os
 import sys
 import math
@@ -36,11 +37,9 @@ import mathutils
 import traceback
 import glob
 import bpy
-import datetime
-import struct
+import time
 import re
 import bmesh
-import copy
 import platform
 import itertools
 import operator
@@ -49,24 +48,55 @@ import tempfile
 
 from pprint import pprint
 
+# **************************************************************************************
+# Names of the objects linked to each collection, so we don't need to search the
+# collection's object list each time we link an object. Cleared at the start of an import.
+globalCollectionObjectNames = {}
+
+def collectionObjectNames(collection):
+    key = collection.as_pointer()
+    names = globalCollectionObjectNames.get(key)
+    if names is None:
+        names = {o.name for o in collection.objects}
+        globalCollectionObjectNames[key] = names
+    return names
+
 # **************************************************************************************
 def linkToScene(ob):
-    if bpy.context.collection.objects.find(ob.name) < 0:
+    names = collectionObjectNames(bpy.context.collection)
+    if ob.name not in names:
         bpy.context.collection.objects.link(ob)
+        names.add(ob.name)
+
+# **************************************************************************************
+def linkManyToScene(obs):
+    collectionObjects = bpy.context.collection.objects
+    names = collectionObjectNames(bpy.context.collection)
+    link = collectionObjects.link
+    for ob in obs:
+        name = ob.name
+        if name not in names:
+            link(ob)
+            names.add(name)
 
 # **************************************************************************************
 def linkToCollection(collectionName, ob):
     # Add object to the appropriate collection
     if hasCollections:
-        if bpy.data.collections[collectionName].objects.find(ob.name) < 0:
-            bpy.data.collections[collectionName].objects.link(ob)
+        collection = bpy.data.collections[collectionName]
+        names = collectionObjectNames(collection)
+        if ob.name not in names:
+            collection.objects.link(ob)
+            names.add(ob.name)
     else:
         bpy.data.groups[collectionName].objects.link(ob)
 
 # **************************************************************************************
 def unlinkFromScene(ob):
-    if bpy.context.collection.objects.find(ob.name) >= 0:
+    names = collectionObjectNames(bpy.context.collection)
+    if ob.name in names:
         bpy.context.collection.objects.unlink(ob)
+        names.discard(ob.name)
 
 # **************************************************************************************
 def selectObject(ob):
@@ -160,6 +190,7 @@ class Options:
     overwriteExistingMaterials = True   # If there's an existing material with the same name, do we overwrite it, or use it?
     overwriteExistingMeshes = True      # If there's an existing mesh with the same name, do we overwrite it, or use it?
     verbose            = 1              # 1 = Show messages while working, 0 = Only show warnings/errors
+    debug              = False          # Run extra (slow) consistency checks while building geometry
 
     addBevelModifier   = True           # Adds a bevel modifier to each part (for rounded edges)
     bevelWidth         = 0.5            # Width of bevel
@@ -207,10 +238,14 @@ globalContext = None
 globalPoints = []
 globalScaleFactor = 0.0004
 globalWeldDistance = 0.0005
+globalMeshOptions = ""          # Options.meshOptionsString() for the current import
 
 hasCollections = None
 lightName = "Light"
 
+# The running Blender version never changes, so check it once
+isBlender4 = bpy.app.version >= (4, 0, 0)
+
 # **************************************************************************************
 # Dictionary with as keys the part numbers (without any extension for decorations)
 # of pieces that have grainy slopes, and as values a set containing the angles (in
@@ -314,18 +349,37 @@ globalLightBricks = {
     '54869.dat':(1.0,0.052,0.017,1.0)
 }
 
-# Create a regular dictionary of parts with ranges of angles to check
+# Create a regular dictionary of parts with ranges of angles to check.
+# Each value is a sorted tuple of non-overlapping (min, max) ranges.
 margin = 5 # Allow 5 degrees either way to compensate for measuring inaccuracies
 globalSlopeAngles = {}
 for part, angles in globalSlopeBricks.items():
-    globalSlopeAngles[part] = {(c-margin, c+margin) if type(c) is not tuple else (min(c)-margin,max(c)+margin) for c in angles}
+    ranges = sorted((c-margin, c+margin) if type(c) is not tuple else (min(c)-margin,max(c)+margin) for c in angles)
+    mergedRanges = [ranges[0]]
+    for (minAngle, maxAngle) in ranges[1:]:
+        if minAngle <= mergedRanges[-1][1]:
+            mergedRanges[-1] = (mergedRanges[-1][0], max(maxAngle, mergedRanges[-1][1]))
+        else:
+            mergedRanges.append((minAngle, maxAngle))
+    globalSlopeAngles[part] = tuple(mergedRanges)
 
 # **************************************************************************************
+# The formatted "HH:MM:SS" part of the timestamp is reused for messages within the same second
+globalTimestampSecond = None
+globalTimestampPrefix = ""
+
 def internalPrint(message):
     """Debug print with identification timestamp."""
+    global globalTimestampSecond
+    global globalTimestampPrefix
 
     # Current timestamp (with milliseconds trimmed to two places)
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S.%f")[:-4]
+    now = time.time()
+    second = int(now)
+    if second != globalTimestampSecond:
+        globalTimestampSecond = second
+        globalTimestampPrefix = time.strftime("%H:%M:%S", time.localtime(second))
+    timestamp = "{0}.{1:02d}".format(globalTimestampPrefix, int((now - second) * 100))
 
     message = "{0} [importldraw] {1}".format(timestamp, message)
     print("{0}".format(message))
@@ -366,12 +420,7 @@ def printError(message):
 # **************************************************************************************
 # **************************************************************************************
 class Math:
-    identityMatrix = mathutils.Matrix((
-        (1.0, 0.0, 0.0, 0.0),
-        (0.0, 1.0, 0.0, 0.0),
-        (0.0, 0.0, 1.0, 0.0),
-        (0.0, 0.0, 0.0, 1.0)
-    ))
+    identityMatrix = mathutils.Matrix.Identity(4)
     rotationMatrix = mathutils.Matrix.Rotation(math.radians(-90), 4, 'X')
     reflectionMatrix = mathutils.Matrix((
         (1.0, 0.0, 0.0, 0.0),
@@ -383,17 +432,6 @@ class Math:
     def clamp01(value):
         return max(min(value, 1.0), 0.0)
 
-    def __init__(self):
-        global globalScaleFactor
-
-        # Rotation and scale matrices that convert LDraw coordinate space to Blender coordinate space
-        Math.scaleMatrix = mathutils.Matrix((
-                (globalScaleFactor, 0.0,               0.0,               0.0),
-                (0.0,               globalScaleFactor, 0.0,               0.0),
-                (0.0,               0.0,               globalScaleFactor, 0.0),
-                (0.0,               0.0,               0.0,               1.0)
-            ))
-
 
 # **************************************************************************************
 # **************************************************************************************
@@ -408,15 +446,54 @@ class Configure:
     warningSuppression = {}
     tempDir = None
 
+    __platform = platform.system()
+
+    # Possible ldraw installation directories for the platform
+    if __platform == "Windows":
+        __ldrawPossibleDirectories = (
+                                        "C:\\LDraw",
+                                        "C:\\Program Files\\LDraw",
+                                        "C:\\Program Files (x86)\\LDraw",
+                                        "C:\\Program Files\\Studio 2.0\\ldraw",
+                                     )
+    elif __platform == "Darwin":
+        __ldrawPossibleDirectories = (
+                                        "~/ldraw/",
+                                        "/Applications/LDraw/",
+                                        "/Applications/ldraw/",
+                                        "/usr/local/share/ldraw",
+                                        "/Applications/Studio 2.0/ldraw",
+                                     )
+    else:   # Default to Linux if not Windows or Mac
+        __ldrawPossibleDirectories = (
+                                        "~/LDraw",
+                                        "~/ldraw",
+                                        "~/.LDraw",
+                                        "~/.ldraw",
+                                        "/usr/local/share/ldraw",
+                                     )
+
     def appendPath(path):
         if os.path.exists(path):
             Configure.searchPaths.append(path)
 
     def __setSearchPaths():
         Configure.searchPaths = []
+        ldrawDir = Configure.ldrawInstallDirectory
+
+        # List the top level of the LDraw directory once, so we don't check for
+        # the existence of paths inside folders that are not installed (e.g. 'tente')
+        try:
+            ldrawFolders = {name.lower() for name in os.listdir(ldrawDir)}
+        except OSError:
+            ldrawFolders = set()
+
+        def appendLDrawPath(*folders):
+            if folders[0] in ldrawFolders:
+                Configure.appendPath(os.path.join(ldrawDir, *folders))
 
         # Always search for parts in the 'models' folder
-        Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "models"))
+        appendLDrawPath("models")
 
         # Search for stud logo parts
         if Options.useLogoStuds and Options.studLogoDirectory != "":
@@ -426,88 +503,61 @@ class Configure:
 
         # Search unofficial parts
         if Options.useUnofficialParts:
-            Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "unofficial", "parts"))
+            appendLDrawPath("unofficial", "parts")
 
             if Options.resolution == "High":
-                Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "unofficial", "p", "48"))
+                appendLDrawPath("unofficial", "p", "48")
             elif Options.resolution == "Low":
-                Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "unofficial", "p", "8"))
-            Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "unofficial", "p"))
+                appendLDrawPath("unofficial", "p", "8")
+            appendLDrawPath("unofficial", "p")
 
             # Add 'Tente' parts too
-            Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "tente", "parts"))
+            appendLDrawPath("tente", "parts")
 
             if Options.resolution == "High":
-                Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "tente", "p", "48"))
+                appendLDrawPath("tente", "p", "48")
             elif Options.resolution == "Low":
-                Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "tente", "p", "8"))
-            Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "tente", "p"))
+                appendLDrawPath("tente", "p", "8")
+            appendLDrawPath("tente", "p")
 
         # Search LSynth parts
         if Options.useLSynthParts:
             if Options.LSynthDirectory != "":
                 Configure.appendPath(Options.LSynthDirectory)
             else:
-                Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "unofficial", "lsynth"))
+                appendLDrawPath("unofficial", "lsynth")
             debugPrint("Use LSynth Parts requested")
 
         # Search official parts
-        Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "parts"))
+        appendLDrawPath("parts")
         if Options.resolution == "High":
-            Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "p", "48"))
+            appendLDrawPath("p", "48")
             debugPrint("High-res primitives selected")
         elif Options.resolution == "Low":
-            Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "p", "8"))
+            appendLDrawPath("p", "8")
             debugPrint("Low-res primitives selected")
         else:
             debugPrint("Standard-res primitives selected")
 
-        Configure.appendPath(os.path.join(Configure.ldrawInstallDirectory, "p"))
+        appendLDrawPath("p")
 
     def isWindows():
-        return platform.system() == "Windows"
+        return Configure.__platform == "Windows"
 
     def isMac():
-        return platform.system() == "Darwin"
+        return Configure.__platform == "Darwin"
 
     def isLinux():
-        return platform.system() == "Linux"
+        return Configure.__platform == "Linux"
 
     def findDefaultLDrawDirectory():
-        result = ""
-        # Get list of possible ldraw installation directories for the platform
-        if Configure.isWindows():
-            ldrawPossibleDirectories = [
-                                            "C:\\LDraw",
-                                            "C:\\Program Files\\LDraw",
-                                            "C:\\Program Files (x86)\\LDraw",
-                                            "C:\\Program Files\\Studio 2.0\\ldraw",
-                                       ]
-        elif Configure.isMac():
-            ldrawPossibleDirectories = [
-                                            "~/ldraw/",
-                                            "/Applications/LDraw/",
-                                            "/Applications/ldraw/",
-                                            "/usr/local/share/ldraw",
-                                            "/Applications/Studio 2.0/ldraw",
-                                       ]
-        else:   # Default to Linux if not Windows or Mac
-            ldrawPossibleDirectories = [
-                                            "~/LDraw",
-                                            "~/ldraw",
-                                            "~/.LDraw",
-                                            "~/.ldraw",
-                                            "/usr/local/share/ldraw",
-                                       ]
-
         # Search possible directories
-        for dir in ldrawPossibleDirectories:
+        for dir in Configure.__ldrawPossibleDirectories:
             dir = os.path.expanduser(dir)
             if os.path.isfile(os.path.join(dir, "LDConfig.ldr")):
-                result = dir
-                break
+                return dir
 
-        return result
+        return ""
 
     def setLDrawDirectory():
         if Options.ldrawDirectory == "":
@@ -529,11 +579,16 @@ class LegoColours:
 
     colours = {}
 
-    def __getValue(line, value):
-        """Parses a colour value from the ldConfig.ldr file"""
-        if value in line:
-            n = line.index(value)
-            return line[n + 1]
+    # Direct colours are documented here: http://www.hassings.dk/l3/l3p.html
+    __directColourRegex = re.compile(r"0x0*([0-9])((?:[A-F0-9]{2}){3})")
+
+    def __getValues(line):
+        """Parses the colour values from a line of the ldConfig.ldr file into a dictionary,
+        keeping the first value for each keyword"""
+        values = {}
+        for n in range(len(line) - 1):
+            values.setdefault(line[n], line[n + 1])
+        return values
 
     def __sRGBtoRGBValue(value):
         # See https://en.wikipedia.org/wiki/SRGB#The_reverse_transformation
@@ -541,39 +596,168 @@ class LegoColours:
             return value / 12.92
         return ((value + 0.055)/1.055)**2.4
 
+    # Linear RGB values for each 8-bit sRGB channel value
+    __linearFrom8Bit = tuple(map(__sRGBtoRGBValue, (i / 255 for i in range(256))))
+
+    # Linear RGB values for each 4-bit sRGB channel value (used by dithered direct colours)
+    __linearFrom4Bit = tuple(map(__sRGBtoRGBValue, (i / 15 for i in range(16))))
+
+    # LGEO is a parts library for rendering LEGO using the povray rendering software.
+    # It has a list of LEGO colours suitable for realistic rendering.
+    # I've extracted the following colours from the LGEO file: lg_color.inc
+    # LGEO is downloadable from http://ldraw.org/downloads-2/downloads.html
+    # Each entry is (LDraw colour code, sRGB red, green, blue) with 8-bit channel values.
+    __lgeoColours = (
+        (0,    33,  33,  33),
+        (1,    13, 105, 171),
+        (2,    40, 127,  70),
+        (3,     0, 143, 155),
+        (4,   196,  40,  27),
+        (5,   205,  98, 152),
+        (6,    98,  71,  50),
+        (7,   161, 165, 162),
+        (8,   109, 110, 108),
+        (9,   180, 210, 227),
+        (10,   75, 151,  74),
+        (11,   85, 165, 175),
+        (12,  242, 112,  94),
+        (13,  252, 151, 172),
+        (14,  245, 205,  47),
+        (15,  242, 243, 242),
+        (17,  194, 218, 184),
+        (18,  249, 233, 153),
+        (19,  215, 197, 153),
+        (20,  193, 202, 222),
+        (21,  224, 255, 176),
+        (22,  107,  50, 123),
+        (23,   35,  71, 139),
+        (25,  218, 133,  64),
+        (26,  146,  57, 120),
+        (27,  164, 189,  70),
+        (28,  149, 138, 115),
+        (29,  228, 173, 200),
+        (30,  172, 120, 186),
+        (31,  225, 213, 237),
+        (32,    0,  20,  20),
+        (33,  123, 182, 232),
+        (34,  132, 182, 141),
+        (35,  217, 228, 167),
+        (36,  205,  84,  75),
+        (37,  228, 173, 200),
+        (38,  255,  43,   0),
+        (40,  166, 145, 130),
+        (41,  170, 229, 255),
+        (42,  198, 255,   0),
+        (43,  193, 223, 240),
+        (44,  150, 112, 159),
+        (46,  247, 241, 141),
+        (47,  252, 252, 252),
+        (52,  156, 149, 199),
+        (54,  255, 246, 123),
+        (57,  226, 176,  96),
+        (65,  236, 201,  53),
+        (66,  202, 176,   0),
+        (67,  255, 255, 255),
+        (68,  243, 207, 155),
+        (69,  142,  66, 133),
+        (70,  105,  64,  39),
+        (71,  163, 162, 164),
+        (72,   99,  95,  97),
+        (73,  110, 153, 201),
+        (74,  161, 196, 139),
+        (77,  220, 144, 149),
+        (78,  246, 215, 179),
+        (79,  255, 255, 255),
+        (80,  140, 140, 140),
+        (82,  219, 172,  52),
+        (84,  170, 125,  85),
+        (85,   52,  43, 117),
+        (86,  124,  92,  69),
+        (89,  155, 178, 239),
+        (92,  204, 142, 104),
+        (100, 238, 196, 182),
+        (115, 199, 210,  60),
+        (134, 174, 122,  89),
+        (135, 171, 173, 172),
+        (137, 106, 122, 150),
+        (142, 220, 188, 129),
+        (148,  62,  60,  57),
+        (151,  14,  94,  77),
+        (179, 160, 160, 160),
+        (183, 242, 243, 242),
+        (191, 248, 187,  61),
+        (212, 159, 195, 233),
+        (216, 143,  76,  42),
+        (226, 253, 234, 140),
+        (232, 125, 187, 221),
+        (256,  33,  33,  33),
+        (272,  32,  58,  86),
+        (273,  13, 105, 171),
+        (288,  39,  70,  44),
+        (294, 189, 198, 173),
+        (297, 170, 127,  46),
+        (308,  53,  33,   0),
+        (313, 171, 217, 255),
+        (320, 123,  46,  47),
+        (321,  70, 155, 195),
+        (322, 104, 195, 226),
+        (323, 211, 242, 234),
+        (324, 196,   0,  38),
+        (326, 226, 249, 154),
+        (330, 119, 119,  78),
+        (334, 187, 165,  61),
+        (335, 149, 121, 118),
+        (366, 209, 131,   4),
+        (373, 135, 124, 144),
+        (375, 193, 194, 193),
+        (378, 120, 144, 129),
+        (379,  94, 116, 140),
+        (383, 224, 224, 224),
+        (406,   0,  29, 104),
+        (449, 129,   0, 123),
+        (450, 203, 132,  66),
+        (462, 226, 155,  63),
+        (484, 160,  95,  52),
+        (490, 215, 240,   0),
+        (493, 101, 103,  97),
+        (494, 208, 208, 208),
+        (496, 163, 162, 164),
+        (503, 199, 193, 183),
+        (504, 137, 135, 136),
+        (511, 250, 250, 250),
+    )
+
     def isDark(colour):
         R = colour[0]
         G = colour[1]
         B = colour[2]
 
-        # Measure the perceived brightness of colour
-        brightness = math.sqrt( 0.299*R*R + 0.587*G*G + 0.114*B*B )
+        # Measure the perceived brightness of colour.
+        # We compare the squared brightness with 0.03 squared, avoiding the square root.
+        brightnessSquared = 0.299*R*R + 0.587*G*G + 0.114*B*B
 
         # Dark colours have white lines
-        if brightness < 0.03:
-            return True
-        return False
+        return brightnessSquared < 0.0009
 
     def sRGBtoLinearRGB(sRGBColour):
         # See https://en.wikipedia.org/wiki/SRGB#The_reverse_transformation
         (sr, sg, sb) = sRGBColour
-        r = LegoColours.__sRGBtoRGBValue(sr)
-        g = LegoColours.__sRGBtoRGBValue(sg)
-        b = LegoColours.__sRGBtoRGBValue(sb)
-        return (r,g,b)
+        toLinear = LegoColours.__sRGBtoRGBValue
+        return (toLinear(sr), toLinear(sg), toLinear(sb))
 
     def hexDigitsToLinearRGBA(hexDigits, alpha):
         # String is "RRGGBB" format
-        int_tuple = struct.unpack('BBB', bytes.fromhex(hexDigits))
-        sRGB = tuple([val / 255 for val in int_tuple])
-        linearRGB = LegoColours.sRGBtoLinearRGB(sRGB)
-        return (linearRGB[0], linearRGB[1], linearRGB[2], alpha)
+        value = int(hexDigits, 16)
+        linearFrom8Bit = LegoColours.__linearFrom8Bit
+        return (linearFrom8Bit[(value >> 16) & 0xFF], linearFrom8Bit[(value >> 8) & 0xFF], linearFrom8Bit[value & 0xFF], alpha)
 
     def hexStringToLinearRGBA(hexString):
         """Convert colour hex value to RGB value."""
         # Handle direct colours
         # Direct colours are documented here: http://www.hassings.dk/l3/l3p.html
-        match = re.fullmatch(r"0x0*([0-9])((?:[A-F0-9]{2}){3})", hexString)
+        if not hexString.startswith("0x"):
+            return None
+        match = LegoColours.__directColourRegex.fullmatch(hexString)
         if match is not None:
             digit = match.group(1)
             rgb_str = match.group(2)
@@ -602,27 +786,16 @@ class LegoColours:
                 # Input string is six hex digits of two colours "RGBRGB".
                 # This was designed to be a dithered colour.
                 # Take the average of those two colours (R+R,G+G,B+B) * 0.5
-                r = float(int(rgb_str[0], 16)) / 15
-                g = float(int(rgb_str[1], 16)) / 15
-                b = float(int(rgb_str[2], 16)) / 15
-                colour1 = LegoColours.sRGBtoLinearRGB((r,g,b))
-                r = float(int(rgb_str[3], 16)) / 15
-                g = float(int(rgb_str[4], 16)) / 15
-                b = float(int(rgb_str[5], 16)) / 15
-                colour2 = LegoColours.sRGBtoLinearRGB((r,g,b))
-                return (0.5 * (colour1[0] + colour2[0]),
-                        0.5 * (colour1[1] + colour2[1]),
-                        0.5 * (colour1[2] + colour2[2]), alpha)
+                packed = int(rgb_str, 16)
+                linearFrom4Bit = LegoColours.__linearFrom4Bit
+                return (0.5 * (linearFrom4Bit[(packed >> 20) & 0xF] + linearFrom4Bit[(packed >> 8) & 0xF]),
+                        0.5 * (linearFrom4Bit[(packed >> 16) & 0xF] + linearFrom4Bit[(packed >> 4) & 0xF]),
+                        0.5 * (linearFrom4Bit[(packed >> 12) & 0xF] + linearFrom4Bit[packed & 0xF]), alpha)
 
             # String is "RRGGBB" format
             return LegoColours.hexDigitsToLinearRGBA(rgb_str, alpha)
         return None
 
-    def __overwriteColour(index, sRGBColour):
-        if index in LegoColours.colours:
-            # Colour Space Management: Convert sRGB colour values to Blender's linear RGB colour space
-            LegoColours.colours[index]["colour"] = LegoColours.sRGBtoLinearRGB(sRGBColour)
-
     def __readColourTable():
         """Reads the colour values from the LDConfig.ldr file. For details of the
         Ldraw colour system see: http://www.ldraw.org/article/547"""
@@ -633,207 +806,85 @@ class LegoColours:
 
         configFilepath = os.path.join(Configure.ldrawInstallDirectory, configFilename)
 
-        ldconfig_lines = ""
+        ldconfig_lines = []
         if os.path.exists(configFilepath):
-            with open(configFilepath, "rt", encoding="utf_8") as ldconfig:
-                ldconfig_lines = ldconfig.readlines()
+            with open(configFilepath, "rb") as ldconfig:
+                ldconfig_lines = ldconfig.read().splitlines()
 
-        for line in ldconfig_lines:
-            if len(line) > 3:
-                if line[2:4].lower() == '!c':
-                    line_split = line.split()
+        # Only the colour lines are decoded from UTF-8
+        for rawLine in ldconfig_lines:
+            if rawLine.lstrip().startswith((b"0 !COLOUR", b"0 !colour")):
+                line_split = rawLine.decode("utf_8").split()
+                values = LegoColours.__getValues(line_split)
 
-                    name = line_split[2]
-                    code = int(line_split[4])
-                    linearRGBA = LegoColours.hexDigitsToLinearRGBA(line_split[6][1:], 1.0)
+                name = line_split[2]
+                code = int(line_split[4])
+                linearRGBA = LegoColours.hexDigitsToLinearRGBA(line_split[6][1:], 1.0)
 
-                    colour = {
-                        "name": name,
-                        "colour": linearRGBA[0:3],
-                        "alpha": linearRGBA[3],
-                        "luminance": 0.0,
-                        "material": "BASIC"
-                    }
+                colour = {
+                    "name": name,
+                    "colour": linearRGBA[0:3],
+                    "alpha": linearRGBA[3],
+                    "luminance": 0.0,
+                    "material": "BASIC"
+                }
 
-                    if "ALPHA" in line_split:
-                        colour["alpha"] = int(LegoColours.__getValue(line_split, "ALPHA")) / 256.0
+                if "ALPHA" in values:
+                    colour["alpha"] = int(values["ALPHA"]) / 256.0
 
-                    if "LUMINANCE" in line_split:
-                        colour["luminance"] = int(LegoColours.__getValue(line_split, "LUMINANCE"))
+                if "LUMINANCE" in values:
+                    colour["luminance"] = int(values["LUMINANCE"])
 
-                    if "CHROME" in line_split:
-                        colour["material"] = "CHROME"
+                if "CHROME" in line_split:
+                    colour["material"] = "CHROME"
 
-                    if "PEARLESCENT" in line_split:
-                        colour["material"] = "PEARLESCENT"
+                if "PEARLESCENT" in line_split:
+                    colour["material"] = "PEARLESCENT"
 
-                    if "RUBBER" in line_split:
-                        colour["material"] = "RUBBER"
+                if "RUBBER" in line_split:
+                    colour["material"] = "RUBBER"
 
-                    if "METAL" in line_split:
-                        colour["material"] = "METAL"
+                if "METAL" in line_split:
+                    colour["material"] = "METAL"
 
-                    if "MATERIAL" in line_split:
-                        subline = line_split[line_split.index("MATERIAL"):]
+                if "MATERIAL" in values:
+                    subline = line_split[line_split.index("MATERIAL"):]
+                    materialValues = LegoColours.__getValues(subline)
 
-                        colour["material"]         = LegoColours.__getValue(subline, "MATERIAL")
-                        hexDigits                  = LegoColours.__getValue(subline, "VALUE")[1:]
-                        colour["secondary_colour"] = LegoColours.hexDigitsToLinearRGBA(hexDigits, 1.0)
-                        colour["fraction"]         = LegoColours.__getValue(subline, "FRACTION")
-                        colour["vfraction"]        = LegoColours.__getValue(subline, "VFRACTION")
-                        colour["size"]             = LegoColours.__getValue(subline, "SIZE")
-                        colour["minsize"]          = LegoColours.__getValue(subline, "MINSIZE")
-                        colour["maxsize"]          = LegoColours.__getValue(subline, "MAXSIZE")
+                    colour["material"]         = materialValues.get("MATERIAL")
+                    hexDigits                  = materialValues.get("VALUE")[1:]
+                    colour["secondary_colour"] = LegoColours.hexDigitsToLinearRGBA(hexDigits, 1.0)
+                    colour["fraction"]         = materialValues.get("FRACTION")
+                    colour["vfraction"]        = materialValues.get("VFRACTION")
+                    colour["size"]             = materialValues.get("SIZE")
+                    colour["minsize"]          = materialValues.get("MINSIZE")
+                    colour["maxsize"]          = materialValues.get("MAXSIZE")
 
-                    LegoColours.colours[code] = colour
+                LegoColours.colours[code] = colour
 
         if Options.useColourScheme == "lgeo":
-            # LGEO is a parts library for rendering LEGO using the povray rendering software.
-            # It has a list of LEGO colours suitable for realistic rendering.
-            # I've extracted the following colours from the LGEO file: lg_color.inc
-            # LGEO is downloadable from http://ldraw.org/downloads-2/downloads.html
             # We overwrite the standard LDraw colours if we have better LGEO colours.
-            LegoColours.__overwriteColour(0,   ( 33/255,  33/255,  33/255))
-            LegoColours.__overwriteColour(1,   ( 13/255, 105/255, 171/255))
-            LegoColours.__overwriteColour(2,   ( 40/255, 127/255,  70/255))
-            LegoColours.__overwriteColour(3,   (  0/255, 143/255, 155/255))
-            LegoColours.__overwriteColour(4,   (196/255,  40/255,  27/255))
-            LegoColours.__overwriteColour(5,   (205/255,  98/255, 152/255))
-            LegoColours.__overwriteColour(6,   ( 98/255,  71/255,  50/255))
-            LegoColours.__overwriteColour(7,   (161/255, 165/255, 162/255))
-            LegoColours.__overwriteColour(8,   (109/255, 110/255, 108/255))
-            LegoColours.__overwriteColour(9,   (180/255, 210/255, 227/255))
-            LegoColours.__overwriteColour(10,  ( 75/255, 151/255,  74/255))
-            LegoColours.__overwriteColour(11,  ( 85/255, 165/255, 175/255))
-            LegoColours.__overwriteColour(12,  (242/255, 112/255,  94/255))
-            LegoColours.__overwriteColour(13,  (252/255, 151/255, 172/255))
-            LegoColours.__overwriteColour(14,  (245/255, 205/255,  47/255))
-            LegoColours.__overwriteColour(15,  (242/255, 243/255, 242/255))
-            LegoColours.__overwriteColour(17,  (194/255, 218/255, 184/255))
-            LegoColours.__overwriteColour(18,  (249/255, 233/255, 153/255))
-            LegoColours.__overwriteColour(19,  (215/255, 197/255, 153/255))
-            LegoColours.__overwriteColour(20,  (193/255, 202/255, 222/255))
-            LegoColours.__overwriteColour(21,  (224/255, 255/255, 176/255))
-            LegoColours.__overwriteColour(22,  (107/255,  50/255, 123/255))
-            LegoColours.__overwriteColour(23,  ( 35/255,  71/255, 139/255))
-            LegoColours.__overwriteColour(25,  (218/255, 133/255,  64/255))
-            LegoColours.__overwriteColour(26,  (146/255, 57/255,  120/255))
-            LegoColours.__overwriteColour(27,  (164/255, 189/255,  70/255))
-            LegoColours.__overwriteColour(28,  (149/255, 138/255, 115/255))
-            LegoColours.__overwriteColour(29,  (228/255, 173/255, 200/255))
-            LegoColours.__overwriteColour(30,  (172/255, 120/255, 186/255))
-            LegoColours.__overwriteColour(31,  (225/255, 213/255, 237/255))
-            LegoColours.__overwriteColour(32,  (  0/255,  20/255,  20/255))
-            LegoColours.__overwriteColour(33,  (123/255, 182/255, 232/255))
-            LegoColours.__overwriteColour(34,  (132/255, 182/255, 141/255))
-            LegoColours.__overwriteColour(35,  (217/255, 228/255, 167/255))
-            LegoColours.__overwriteColour(36,  (205/255,  84/255,  75/255))
-            LegoColours.__overwriteColour(37,  (228/255, 173/255, 200/255))
-            LegoColours.__overwriteColour(38,  (255/255,  43/255,   0/225))
-            LegoColours.__overwriteColour(40,  (166/255, 145/255, 130/255))
-            LegoColours.__overwriteColour(41,  (170/255, 229/255, 255/255))
-            LegoColours.__overwriteColour(42,  (198/255, 255/255,   0/255))
-            LegoColours.__overwriteColour(43,  (193/255, 223/255, 240/255))
-            LegoColours.__overwriteColour(44,  (150/255, 112/255, 159/255))
-            LegoColours.__overwriteColour(46,  (247/255, 241/255, 141/255))
-            LegoColours.__overwriteColour(47,  (252/255, 252/255, 252/255))
-            LegoColours.__overwriteColour(52,  (156/255, 149/255, 199/255))
-            LegoColours.__overwriteColour(54,  (255/255, 246/255, 123/255))
-            LegoColours.__overwriteColour(57,  (226/255, 176/255,  96/255))
-            LegoColours.__overwriteColour(65,  (236/255, 201/255,  53/255))
-            LegoColours.__overwriteColour(66,  (202/255, 176/255,   0/255))
-            LegoColours.__overwriteColour(67,  (255/255, 255/255, 255/255))
-            LegoColours.__overwriteColour(68,  (243/255, 207/255, 155/255))
-            LegoColours.__overwriteColour(69,  (142/255,  66/255, 133/255))
-            LegoColours.__overwriteColour(70,  (105/255,  64/255,  39/255))
-            LegoColours.__overwriteColour(71,  (163/255, 162/255, 164/255))
-            LegoColours.__overwriteColour(72,  ( 99/255,  95/255,  97/255))
-            LegoColours.__overwriteColour(73,  (110/255, 153/255, 201/255))
-            LegoColours.__overwriteColour(74,  (161/255, 196/255, 139/255))
-            LegoColours.__overwriteColour(77,  (220/255, 144/255, 149/255))
-            LegoColours.__overwriteColour(78,  (246/255, 215/255, 179/255))
-            LegoColours.__overwriteColour(79,  (255/255, 255/255, 255/255))
-            LegoColours.__overwriteColour(80,  (140/255, 140/255, 140/255))
-            LegoColours.__overwriteColour(82,  (219/255, 172/255,  52/255))
-            LegoColours.__overwriteColour(84,  (170/255, 125/255,  85/255))
-            LegoColours.__overwriteColour(85,  ( 52/255,  43/255, 117/255))
-            LegoColours.__overwriteColour(86,  (124/255,  92/255,  69/255))
-            LegoColours.__overwriteColour(89,  (155/255, 178/255, 239/255))
-            LegoColours.__overwriteColour(92,  (204/255, 142/255, 104/255))
-            LegoColours.__overwriteColour(100, (238/255, 196/255, 182/255))
-            LegoColours.__overwriteColour(115, (199/255, 210/255,  60/255))
-            LegoColours.__overwriteColour(134, (174/255, 122/255,  89/255))
-            LegoColours.__overwriteColour(135, (171/255, 173/255, 172/255))
-            LegoColours.__overwriteColour(137, (106/255, 122/255, 150/255))
-            LegoColours.__overwriteColour(142, (220/255, 188/255, 129/255))
-            LegoColours.__overwriteColour(148, ( 62/255,  60/255,  57/255))
-            LegoColours.__overwriteColour(151, ( 14/255,  94/255,  77/255))
-            LegoColours.__overwriteColour(179, (160/255, 160/255, 160/255))
-            LegoColours.__overwriteColour(183, (242/255, 243/255, 242/255))
-            LegoColours.__overwriteColour(191, (248/255, 187/255,  61/255))
-            LegoColours.__overwriteColour(212, (159/255, 195/255, 233/255))
-            LegoColours.__overwriteColour(216, (143/255,  76/255,  42/255))
-            LegoColours.__overwriteColour(226, (253/255, 234/255, 140/255))
-            LegoColours.__overwriteColour(232, (125/255, 187/255, 221/255))
-            LegoColours.__overwriteColour(256, ( 33/255,  33/255,  33/255))
-            LegoColours.__overwriteColour(272, ( 32/255,  58/255,  86/255))
-            LegoColours.__overwriteColour(273, ( 13/255, 105/255, 171/255))
-            LegoColours.__overwriteColour(288, ( 39/255,  70/255,  44/255))
-            LegoColours.__overwriteColour(294, (189/255, 198/255, 173/255))
-            LegoColours.__overwriteColour(297, (170/255, 127/255,  46/255))
-            LegoColours.__overwriteColour(308, ( 53/255,  33/255,   0/255))
-            LegoColours.__overwriteColour(313, (171/255, 217/255, 255/255))
-            LegoColours.__overwriteColour(320, (123/255,  46/255,  47/255))
-            LegoColours.__overwriteColour(321, ( 70/255, 155/255, 195/255))
-            LegoColours.__overwriteColour(322, (104/255, 195/255, 226/255))
-            LegoColours.__overwriteColour(323, (211/255, 242/255, 234/255))
-            LegoColours.__overwriteColour(324, (196/255,   0/255,  38/255))
-            LegoColours.__overwriteColour(326, (226/255, 249/255, 154/255))
-            LegoColours.__overwriteColour(330, (119/255, 119/255,  78/255))
-            LegoColours.__overwriteColour(334, (187/255, 165/255,  61/255))
-            LegoColours.__overwriteColour(335, (149/255, 121/255, 118/255))
-            LegoColours.__overwriteColour(366, (209/255, 131/255,   4/255))
-            LegoColours.__overwriteColour(373, (135/255, 124/255, 144/255))
-            LegoColours.__overwriteColour(375, (193/255, 194/255, 193/255))
-            LegoColours.__overwriteColour(378, (120/255, 144/255, 129/255))
-            LegoColours.__overwriteColour(379, ( 94/255, 116/255, 140/255))
-            LegoColours.__overwriteColour(383, (224/255, 224/255, 224/255))
-            LegoColours.__overwriteColour(406, (  0/255,  29/255, 104/255))
-            LegoColours.__overwriteColour(449, (129/255,   0/255, 123/255))
-            LegoColours.__overwriteColour(450, (203/255, 132/255,  66/255))
-            LegoColours.__overwriteColour(462, (226/255, 155/255,  63/255))
-            LegoColours.__overwriteColour(484, (160/255,  95/255,  52/255))
-            LegoColours.__overwriteColour(490, (215/255, 240/255,   0/255))
-            LegoColours.__overwriteColour(493, (101/255, 103/255,  97/255))
-            LegoColours.__overwriteColour(494, (208/255, 208/255, 208/255))
-            LegoColours.__overwriteColour(496, (163/255, 162/255, 164/255))
-            LegoColours.__overwriteColour(503, (199/255, 193/255, 183/255))
-            LegoColours.__overwriteColour(504, (137/255, 135/255, 136/255))
-            LegoColours.__overwriteColour(511, (250/255, 250/255, 250/255))
+            # Colour Space Management: Convert sRGB colour values to Blender's linear RGB colour space
+            linearFrom8Bit = LegoColours.__linearFrom8Bit
+            for (code, r, g, b) in LegoColours.__lgeoColours:
+                colour = LegoColours.colours.get(code)
+                if colour is not None:
+                    colour["colour"] = (linearFrom8Bit[r], linearFrom8Bit[g], linearFrom8Bit[b])
 
     def lightenRGBA(colour, scale):
         # Moves the linear RGB values closer to white
         # scale = 0 means full white
         # scale = 1 means color stays same
-        colour = ((1.0 - colour[0]) * scale,
-                  (1.0 - colour[1]) * scale,
-                  (1.0 - colour[2]) * scale,
-                  colour[3])
-        return (Math.clamp01(1.0 - colour[0]),
-                Math.clamp01(1.0 - colour[1]),
-                Math.clamp01(1.0 - colour[2]),
+        clamp01 = Math.clamp01
+        return (clamp01(1.0 - (1.0 - colour[0]) * scale),
+                clamp01(1.0 - (1.0 - colour[1]) * scale),
+                clamp01(1.0 - (1.0 - colour[2]) * scale),
                 colour[3])
 
+    __fluorescentTransparentNames = frozenset(("Trans_Neon_Orange", "Trans_Neon_Green", "Trans_Neon_Yellow", "Trans_Bright_Green"))
+
     def isFluorescentTransparent(colName):
-        if (colName == "Trans_Neon_Orange"):
-            return True
-        if (colName == "Trans_Neon_Green"):
-            return True
-        if (colName == "Trans_Neon_Yellow"):
-            return True
-        if (colName == "Trans_Bright_Green"):
-            return True
-        return False
+        return colName in LegoColours.__fluorescentTransparentNames
 
     def __init__(self):
         LegoColours.__readColourTable()
@@ -877,7 +928,7 @@ class FileSystem:
         Recursive part of path_insensitive to do the work.
         """
 
-        if path == '' or os.path.exists(path):
+        if path == '' or CachedPathExists.exists(path):
             return path
 
         base = os.path.basename(path)  # may be a directory or a file
@@ -891,7 +942,7 @@ class FileSystem:
             base = os.path.basename(dirname)
             dirname = os.path.dirname(dirname)
 
-        if not os.path.exists(dirname):
+        if not CachedPathExists.exists(dirname):
             debug_dirname = dirname
             dirname = FileSystem.__pathInsensitive(dirname)
             if not dirname:
@@ -902,30 +953,26 @@ class FileSystem:
         try:  # we are expecting dirname to be a directory, but it could be a file
             files = CachedDirectoryFilenames.getCached(dirname)
             if files is None:
-                files = os.listdir(dirname)
+                # Map lowercase filenames to the first matching actual filename
+                files = {}
+                for fl in os.listdir(dirname):
+                    files.setdefault(fl.lower(), fl)
                 CachedDirectoryFilenames.addToCache(dirname, files)
         except OSError:
             return
 
-        baselow = base.lower()
-        try:
-            basefinal = next(fl for fl in files if fl.lower() == baselow)
-        except StopIteration:
-            return
+        basefinal = files.get(base.lower())
 
         if basefinal:
             return os.path.join(dirname, basefinal) + suffix
         else:
             return
 
-    def __checkEncoding(filepath):
-        """Check the encoding of a file for Endian encoding."""
-
-        filepath = FileSystem.pathInsensitive(filepath)
+    def __checkEncoding(data):
+        """Check the encoding of the file contents for Endian encoding."""
 
-        # Open it, read just the area containing a possible byte mark
-        with open(filepath, "rb") as encode_check:
-            encoding = encode_check.readline(3)
+        # Look at just the area containing a possible byte mark
+        encoding = data[:3]
 
         # The file uses UCS-2 (UTF-16) Big Endian encoding
         if encoding == b"\xfe\xff\x00":
@@ -946,15 +993,18 @@ class FileSystem:
 
         lines = None
         if os.path.exists(filepath):
-            # Try to read using the suspected encoding
-            file_encoding = FileSystem.__checkEncoding(filepath)
+            # Read the file once, then decode using the suspected encoding
+            with open(filepath, "rb") as f_in:
+                data = f_in.read()
+            file_encoding = FileSystem.__checkEncoding(data)
             try:
-                with open(filepath, "rt", encoding=file_encoding) as f_in:
-                    lines = f_in.readlines()
-            except:
+                text = data.decode(file_encoding)
+            except UnicodeDecodeError:
                 # If all else fails, read using Latin 1 encoding
-                with open(filepath, "rt", encoding="latin_1") as f_in:
-                    lines = f_in.readlines()
+                text = data.decode("latin_1")
+            # Split on newlines only (as readlines() does), not on the other characters
+            # str.splitlines() treats as line breaks, such as '\x85' from the Latin 1 fallback
+            lines = io.StringIO(text, newline=None).readlines()
 
         return lines
 
@@ -967,15 +1017,15 @@ class FileSystem:
         if rootPath is None:
             rootPath = os.path.dirname(filename)
 
-        allSearchPaths = Configure.searchPaths[:]
+        allSearchPaths = Configure.searchPaths
         if rootPath not in allSearchPaths:
-            allSearchPaths.append(rootPath)
+            allSearchPaths = allSearchPaths + [rootPath]
 
         for path in allSearchPaths:
             fullPathName = os.path.join(path, partName)
             fullPathName = FileSystem.pathInsensitive(fullPathName)
 
-            if os.path.exists(fullPathName):
+            if CachedPathExists.exists(fullPathName):
                 return fullPathName
 
         return None
@@ -984,7 +1034,8 @@ class FileSystem:
 # **************************************************************************************
 # **************************************************************************************
 class CachedDirectoryFilenames:
-    """Cached dictionary of directory filenames keyed by directory path"""
+    """Cached dictionary of directory filenames keyed by directory path.
+    Each value is a dictionary of lowercase filenames to actual filenames."""
 
     __cache = {}        # Dictionary
 
@@ -1000,31 +1051,40 @@ class CachedDirectoryFilenames:
         CachedDirectoryFilenames.__cache = {}
 
 
+# **************************************************************************************
+# **************************************************************************************
+class CachedPathExists:
+    """Cached dictionary of whether a path exists, keyed by path"""
+
+    __cache = {}        # Dictionary
+
+    def exists(path):
+        result = CachedPathExists.__cache.get(path)
+        if result is None:
+            result = os.path.exists(path)
+            CachedPathExists.__cache[path] = result
+        return result
+
+    def clearCache():
+        CachedPathExists.__cache = {}
+
+
 # **************************************************************************************
 # **************************************************************************************
 class CachedFiles:
     """Cached dictionary of LDrawFile objects keyed by filename"""
 
-    __cache = {}        # Dictionary of exact filenames as keys, and file contents as values
-    __lowercache = {}   # Dictionary of lowercase filenames as keys, and file contents as values
+    __cache = {}        # Dictionary of lowercase filenames as keys, and file contents as values
 
     def getCached(key):
-        # Look for an exact match in the cache first
-        if key in CachedFiles.__cache:
-            return CachedFiles.__cache[key]
-
-        # Look for a case-insensitive match next
-        if key.lower() in CachedFiles.__lowercache:
-            return CachedFiles.__lowercache[key.lower()]
-        return None
+        # LDraw filenames are case-insensitive
+        return CachedFiles.__cache.get(key.lower())
 
     def addToCache(key, value):
-        CachedFiles.__cache[key] = value
-        CachedFiles.__lowercache[key.lower()] = value
+        CachedFiles.__cache[key.lower()] = value
 
     def clearCache():
         CachedFiles.__cache = {}
-        CachedFiles.__lowercache = {}
 
 
 # **************************************************************************************
@@ -1045,16 +1105,6 @@ class CachedGeometry:
     def clearCache():
         CachedGeometry.__cache = {}
 
-# **************************************************************************************
-# **************************************************************************************
-class FaceInfo:
-    def __init__(self, faceColour, culling, windingCCW, isGrainySlopeAllowed):
-        self.faceColour = faceColour
-        self.culling = culling
-        self.windingCCW = windingCCW
-        self.isGrainySlopeAllowed = isGrainySlopeAllowed
-
-
 # **************************************************************************************
 # **************************************************************************************
 class LDrawGeometry:
@@ -1063,7 +1113,13 @@ class LDrawGeometry:
     def __init__(self):
         self.points = []
         self.faces = []
-        self.faceInfo = []
+
+        # Information about each face, stored as lists parallel to self.faces
+        self.faceColours = []
+        self.faceCulling = []
+        self.faceWindingCCW = []
+        self.faceGrainySlopeAllowed = []
+
         self.edges = []
         self.edgeIndices = []
 
@@ -1071,50 +1127,64 @@ class LDrawGeometry:
         """Parse a face from parameters"""
 
         num_points = int(parameters[0])
-        colourName = parameters[1]
+        colourName = sys.intern(parameters[1])
 
-        newPoints = []
-        for i in range(num_points):
-            blenderPos = Math.scaleMatrix @ mathutils.Vector( (float(parameters[i * 3 + 2]),
-                                                               float(parameters[i * 3 + 3]),
-                                                               float(parameters[i * 3 + 4])) )
-            newPoints.append(blenderPos)
+        # Convert from LDraw units to Blender units
+        scale = globalScaleFactor
+        coords = [scale * float(value) for value in parameters[2:2 + num_points * 3]]
+        newPoints = [mathutils.Vector(coords[i:i + 3]) for i in range(0, num_points * 3, 3)]
 
         # Fix "bowtie" quadrilaterals (see http://wiki.ldraw.org/index.php?title=LDraw_technical_restrictions#Complex_quadrilaterals)
         if num_points == 4:
             nA = (newPoints[1] - newPoints[0]).cross(newPoints[2] - newPoints[0])
             nB = (newPoints[2] - newPoints[1]).cross(newPoints[3] - newPoints[1])
-            nC = (newPoints[3] - newPoints[2]).cross(newPoints[0] - newPoints[2])
             if (nA.dot(nB) < 0):
                 newPoints[2], newPoints[3] = newPoints[3], newPoints[2]
-            elif (nB.dot(nC) < 0):
-                newPoints[2], newPoints[1] = newPoints[1], newPoints[2]
+            else:
+                nC = (newPoints[3] - newPoints[2]).cross(newPoints[0] - newPoints[2])
+                if (nB.dot(nC) < 0):
+                    newPoints[2], newPoints[1] = newPoints[1], newPoints[2]
 
         pointCount = len(self.points)
         newFace = list(range(pointCount, pointCount + num_points))
         self.points.extend(newPoints)
         self.faces.append(newFace)
-        self.faceInfo.append(FaceInfo(colourName, cull, ccw, isGrainySlopeAllowed))
+        self.faceColours.append(colourName)
+        self.faceCulling.append(cull)
+        self.faceWindingCCW.append(ccw)
+        self.faceGrainySlopeAllowed.append(isGrainySlopeAllowed)
+
+    def verify(self):
+        """Check the face lists are consistent with each other and with the points"""
+
+        numFaces = len(self.faces)
+        assert len(self.faceColours) == numFaces
+        assert len(self.faceCulling) == numFaces
+        assert len(self.faceWindingCCW) == numFaces
+        assert len(self.faceGrainySlopeAllowed) == numFaces
+
+        numPoints = len(self.points)
+        for face in self.faces:
+            for i in face:
+                assert 0 <= i < numPoints
 
     def parseEdge(self, parameters):
         """Parse an edge from parameters"""
 
         colourName = parameters[1]
         if colourName == "24":
-            blenderPos1 = Math.scaleMatrix @ mathutils.Vector( (float(parameters[2]),
-                                                                float(parameters[3]),
-                                                                float(parameters[4])) )
-            blenderPos2 = Math.scaleMatrix @ mathutils.Vector( (float(parameters[5]),
-                                                                float(parameters[6]),
-                                                                float(parameters[7])) )
+            scale = globalScaleFactor
+            blenderPos1 = mathutils.Vector( (scale * float(parameters[2]),
+                                             scale * float(parameters[3]),
+                                             scale * float(parameters[4])) )
+            blenderPos2 = mathutils.Vector( (scale * float(parameters[5]),
+                                             scale * float(parameters[6]),
+                                             scale * float(parameters[7])) )
             self.edges.append((blenderPos1, blenderPos2))
 
-    def verify(self, face, numPoints):
-        for i in face:
-            assert i < numPoints
-            assert i >= 0
+    def appendGeometry(self, geometry, matrix, isStud, isStudLogo, parentMatrix, cull, invert, colourName="16"):
+        """Appends transformed geometry, replacing the default colour 16 of its faces with colourName"""
 
-    def appendGeometry(self, geometry, matrix, isStud, isStudLogo, parentMatrix, cull, invert):
         combinedMatrix = parentMatrix @ matrix
         isReflected = combinedMatrix.determinant() < 0.0
         reflectStudLogo = isStudLogo and isReflected
@@ -1124,23 +1194,26 @@ class LDrawGeometry:
             fixedMatrix = matrix @ Math.reflectionMatrix
             invert = not invert
 
+        # Transform all the points once
+        transformedPoints = [fixedMatrix @ p for p in geometry.points]
+
         # Append face information
         pointCount = len(self.points)
-        newFaceInfo = []
+        newFaceColours = []
+        newFaceGrainySlopeAllowed = []
         for index, face in enumerate(geometry.faces):
-            # Gather points for this face (and transform points)
-            newPoints = []
-            for i in face:
-                newPoints.append(fixedMatrix @ geometry.points[i])
+            # Gather points for this face
+            newPoints = [transformedPoints[i] for i in face]
 
             # Add clockwise and/or anticlockwise sets of points as appropriate
-            newFace = face.copy()
-            for i in range(len(newFace)):
-                newFace[i] += pointCount
+            newFace = [i + pointCount for i in face]
 
-            faceInfo = geometry.faceInfo[index]
-            faceCCW = faceInfo.windingCCW != invert
-            faceCull = faceInfo.culling and cull
+            faceColour = geometry.faceColours[index]
+            if faceColour == "16":
+                faceColour = colourName
+            faceCCW = geometry.faceWindingCCW[index] != invert
+            faceCull = geometry.faceCulling[index] and cull
+            faceGrainySlopeAllowed = not isStud and geometry.faceGrainySlopeAllowed[index]
 
             # If we are going to resolve ambiguous normals by "best guess" we will let
             # Blender calculate that for us later. Just cull with arbitrary winding for now.
@@ -1152,30 +1225,31 @@ class LDrawGeometry:
                 self.points.extend(newPoints)
                 self.faces.append(newFace)
 
-                newFaceInfo.append(FaceInfo(faceInfo.faceColour, True, True, not isStud and faceInfo.isGrainySlopeAllowed))
-                self.verify(newFace, len(self.points))
+                newFaceColours.append(faceColour)
+                newFaceGrainySlopeAllowed.append(faceGrainySlopeAllowed)
 
             if not faceCull:
-                newFace = newFace.copy()
                 pointCount += len(newPoints)
-                for i in range(len(newFace)):
-                    newFace[i] += len(newPoints)
+                newFace = [i + len(newPoints) for i in newFace]
 
             if not faceCCW or not faceCull:
-                self.points.extend(newPoints[::-1])
+                self.points.extend(reversed(newPoints))
                 self.faces.append(newFace)
 
-                newFaceInfo.append(FaceInfo(faceInfo.faceColour, True, True, not isStud and faceInfo.isGrainySlopeAllowed))
-                self.verify(newFace, len(self.points))
+                newFaceColours.append(faceColour)
+                newFaceGrainySlopeAllowed.append(faceGrainySlopeAllowed)
 
-        self.faceInfo.extend(newFaceInfo)
-        assert len(self.faces) == len(self.faceInfo)
+        # The appended faces are now culled with an anticlockwise winding
+        self.faceColours.extend(newFaceColours)
+        self.faceCulling.extend([True] * len(newFaceColours))
+        self.faceWindingCCW.extend([True] * len(newFaceColours))
+        self.faceGrainySlopeAllowed.extend(newFaceGrainySlopeAllowed)
+        assert len(self.faces) == len(self.faceColours)
+        if Options.debug:
+            self.verify()
 
         # Append edge information
-        newEdges = []
-        for edge in geometry.edges:
-            newEdges.append( (fixedMatrix @ edge[0], fixedMatrix @ edge[1]) )
-        self.edges.extend(newEdges)
+        self.edges.extend([(fixedMatrix @ edge[0], fixedMatrix @ edge[1]) for edge in geometry.edges])
 
 
 # **************************************************************************************
@@ -1183,32 +1257,32 @@ class LDrawGeometry:
 class LDrawNode:
     """A node in the hierarchy. References one LDrawFile"""
 
-    def __init__(self, filename, isFullFilepath, parentFilepath, colourName=Options.defaultColour, matrix=Math.identityMatrix, bfcCull=True, bfcInverted=False, isLSynthPart=False, isSubPart=False, isRootNode=True, groupNames=[]):
-        self.filename       = filename
+    def __init__(self, filename, isFullFilepath, parentFilepath, colourName=Options.defaultColour, matrix=Math.identityMatrix, bfcCull=True, bfcInverted=False, isLSynthPart=False, isSubPart=False, isRootNode=True, groupNames=()):
+        # Filenames and colour names repeat many times, and are used in the geometry cache keys
+        self.filename       = sys.intern(filename)
         self.isFullFilepath = isFullFilepath
         self.parentFilepath = parentFilepath
         self.matrix         = matrix
-        self.colourName     = colourName
+        self.colourName     = sys.intern(colourName)
         self.bfcInverted    = bfcInverted
         self.bfcCull        = bfcCull
         self.file           = None
         self.isLSynthPart   = isLSynthPart
         self.isSubPart      = isSubPart
         self.isRootNode     = isRootNode
-        self.groupNames     = groupNames.copy()
+        self.groupNames     = tuple(groupNames) if groupNames else ()
 
     def look_at(obj_camera, target, up_vector):
-        bpy.context.view_layer.update()
-
-        loc_camera = obj_camera.matrix_world.to_translation()
+        # The camera has no parent, so its world location is just its location.
+        # This avoids a full view layer update for every camera.
+        loc_camera = obj_camera.location.copy()
 
         #print("CamLoc = " + str(loc_camera[0]) + "," + str(loc_camera[1]) + "," + str(loc_camera[2]))
         #print("TarLoc = " + str(target[0]) + "," + str(target[1]) + "," + str(target[2]))
         #print("UpVec  = " + str(up_vector[0]) + "," + str(up_vector[1]) + "," + str(up_vector[2]))
 
         # back vector is a vector pointing from the target to the camera
-        back = loc_camera - target;
-        back.normalize()
+        back = (loc_camera - target).normalized()
 
         # If our back and up vectors are very close to pointing the same way (or opposite), choose a different up_vector
         if (abs(back.dot(up_vector)) > 0.9999):
@@ -1216,15 +1290,13 @@ class LDrawNode:
             if (abs(back.dot(up_vector)) > 0.9999):
                 up_vector=mathutils.Vector((1.0,0.0,0.0))
 
-        right = up_vector.cross(back)
-        right.normalize()
-        up = back.cross(right)
-        up.normalize()
+        right = up_vector.cross(back).normalized()
+        up = back.cross(right).normalized()
 
-        row1 = [   right.x,   up.x,   back.x, loc_camera.x ]
-        row2 = [   right.y,   up.y,   back.y, loc_camera.y ]
-        row3 = [   right.z,   up.z,   back.z, loc_camera.z ]
-        row4 = [       0.0,    0.0,      0.0,          1.0 ]
+        row1 = (   right.x,   up.x,   back.x, loc_camera.x )
+        row2 = (   right.y,   up.y,   back.y, loc_camera.y )
+        row3 = (   right.z,   up.z,   back.z, loc_camera.z )
+        row4 = (       0.0,    0.0,      0.0,          1.0 )
 
         #bpy.ops.mesh.primitive_ico_sphere_add(location=loc_camera+up,size=0.1)
         #bpy.ops.mesh.primitive_cylinder_add(location=loc_camera+back,radius = 0.1, depth=0.2)
@@ -1262,19 +1334,27 @@ class LDrawNode:
         return isBON
 
     def load(self):
-        # Is this file in the cache?
-        self.file = CachedFiles.getCached(self.filename)
-        if self.file is None:
-            # Not in cache, so load file
-            self.file = LDrawFile(self.filename, self.isFullFilepath, self.parentFilepath, None, self.isSubPart)
-            assert self.file is not None
-
-            # Add the new file to the cache
-            CachedFiles.addToCache(self.filename, self.file)
-
-        # Load any children
-        for child in self.file.childNodes:
-            child.load()
+        # Load the nodes in the same depth first order as a recursive walk would, but using our own
+        # stack. The children of a file are shared by every node that references it, so only visit them once.
+        visitedFiles = set()
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+
+            # Is this file in the cache?
+            node.file = CachedFiles.getCached(node.filename)
+            if node.file is None:
+                # Not in cache, so load file
+                node.file = LDrawFile(node.filename, node.isFullFilepath, node.parentFilepath, None, node.isSubPart)
+                assert node.file is not None
+
+                # Add the new file to the cache
+                CachedFiles.addToCache(node.filename, node.file)
+
+            # Load any children
+            if node.file not in visitedFiles:
+                visitedFiles.add(node.file)
+                nodes.extend(reversed(node.file.childNodes))
 
     def resolveColour(colourName, realColourName):
         if colourName == "16":
@@ -1319,14 +1399,10 @@ class LDrawNode:
         if bakedGeometry is None:
             combinedMatrix = parentMatrix @ self.matrix
 
-            # Start with a copy of our file's geometry
-            assert len(self.file.geometry.faces) == len(self.file.geometry.faceInfo)
+            # Start with a copy of our file's geometry, replacing the default colour 16 with our specific colour
+            assert len(self.file.geometry.faces) == len(self.file.geometry.faceColours)
             bakedGeometry = LDrawGeometry()
-            bakedGeometry.appendGeometry(self.file.geometry, Math.identityMatrix, self.file.isStud, self.file.isStudLogo, combinedMatrix, self.bfcCull, self.bfcInverted)
-
-            # Replaces the default colour 16 in our faceColours list with a specific colour
-            for faceInfo in bakedGeometry.faceInfo:
-                faceInfo.faceColour = LDrawNode.resolveColour(faceInfo.faceColour, ourColourName)
+            bakedGeometry.appendGeometry(self.file.geometry, Math.identityMatrix, self.file.isStud, self.file.isStudLogo, combinedMatrix, self.bfcCull, self.bfcInverted, ourColourName)
 
             # Append each child's geometry
             for child in self.file.childNodes:
@@ -1340,7 +1416,7 @@ class LDrawNode:
                     bakedGeometry.appendGeometry(bg, child.matrix, isStud, isStudLogo, combinedMatrix, self.bfcCull, self.bfcInverted)
 
             CachedGeometry.addToCache(key, bakedGeometry)
-        assert len(bakedGeometry.faces) == len(bakedGeometry.faceInfo)
+        assert len(bakedGeometry.faces) == len(bakedGeometry.faceColours)
         return (meshName, bakedGeometry)
 
 
@@ -1451,35 +1527,33 @@ class LDrawFile:
         # Split into sections between "0 FILE" and "0 NOFILE" lines
         sections = []
 
-        startLine = 0
-        endLine = 0
-        lineCount = 0
         sectionFilename = filepath
-        foundEnd = False
+        sectionLines = []
+        inSection = True
 
         for line in lines:
-            parameters = line.strip().split()
-            if len(parameters) > 2:
-                if parameters[0] == "0" and parameters[1] == "FILE":
-                    if foundEnd == False:
-                        endLine = lineCount
-                        if endLine > startLine:
-                            sections.append((sectionFilename, lines[startLine:endLine]))
-
-                    startLine = lineCount
-                    foundEnd = False
-                    sectionFilename = " ".join(parameters[2:])
-
-                if parameters[0] == "0" and parameters[1] == "NOFILE":
-                    endLine = lineCount
-                    foundEnd = True
-                    sections.append((sectionFilename, lines[startLine:endLine]))
-            lineCount += 1
-
-        if foundEnd == False:
-            endLine = lineCount
-            if endLine > startLine:
-                sections.append((sectionFilename, lines[startLine:endLine]))
+            parameters = line.split(None, 2)
+            if len(parameters) > 1 and parameters[0] == "0":
+                if parameters[1] == "FILE" and len(parameters) > 2:
+                    if inSection and sectionLines:
+                        sections.append((sectionFilename, sectionLines))
+
+                    sectionFilename = " ".join(parameters[2].split())
+                    sectionLines = []
+                    inSection = True
+
+                elif parameters[1] == "NOFILE":
+                    if inSection:
+                        sections.append((sectionFilename, sectionLines))
+                    sectionLines = []
+                    inSection = False
+                    continue
+
+            if inSection:
+                sectionLines.append(line)
+
+        if inSection and sectionLines:
+            sections.append((sectionFilename, sectionLines))
 
         if len(sections) == 0:
             return False
@@ -1499,39 +1573,41 @@ class LDrawFile:
 
         return True
 
+    __studLogoNames = frozenset(("logo3.dat", "logo4.dat", "logo5.dat", "logotente.dat"))
+
+    __studNames = frozenset((
+        "stud2.dat",
+        "stud6.dat",
+        "stud6a.dat",
+        "stud7.dat",
+        "stud10.dat",
+        "stud13.dat",
+        "stud15.dat",
+        "stud20.dat",
+        "studa.dat",
+        "teton.dat",        # TENTE
+        "stud-logo3.dat",   "stud-logo4.dat",   "stud-logo5.dat",
+        "stud2-logo3.dat",  "stud2-logo4.dat",  "stud2-logo5.dat",
+        "stud6-logo3.dat",  "stud6-logo4.dat",  "stud6-logo5.dat",
+        "stud6a-logo3.dat", "stud6a-logo4.dat", "stud6a-logo5.dat",
+        "stud7-logo3.dat",  "stud7-logo4.dat",  "stud7-logo5.dat",
+        "stud10-logo3.dat", "stud10-logo4.dat", "stud10-logo5.dat",
+        "stud13-logo3.dat", "stud13-logo4.dat", "stud13-logo5.dat",
+        "stud15-logo3.dat", "stud15-logo4.dat", "stud15-logo5.dat",
+        "stud20-logo3.dat", "stud20-logo4.dat", "stud20-logo5.dat",
+        "studa-logo3.dat",  "studa-logo4.dat",  "studa-logo5.dat",
+        "studtente-logo.dat"    # TENTE
+        ))
+
     def __isStud(filename):
         """Is this file a stud?"""
 
-        if LDrawFile.__isStudLogo(filename):
-            return True
-
         # Extract just the filename, in lower case
         filename = filename.replace("\\", os.path.sep)
         name = os.path.basename(filename).lower()
 
-        return name in (
-            "stud2.dat",
-            "stud6.dat",
-            "stud6a.dat",
-            "stud7.dat",
-            "stud10.dat",
-            "stud13.dat",
-            "stud15.dat",
-            "stud20.dat",
-            "studa.dat",
-            "teton.dat",        # TENTE
-            "stud-logo3.dat",   "stud-logo4.dat",   "stud-logo5.dat",
-            "stud2-logo3.dat",  "stud2-logo4.dat",  "stud2-logo5.dat",
-            "stud6-logo3.dat",  "stud6-logo4.dat",  "stud6-logo5.dat",
-            "stud6a-logo3.dat", "stud6a-logo4.dat", "stud6a-logo5.dat",
-            "stud7-logo3.dat",  "stud7-logo4.dat",  "stud7-logo5.dat",
-            "stud10-logo3.dat", "stud10-logo4.dat", "stud10-logo5.dat",
-            "stud13-logo3.dat", "stud13-logo4.dat", "stud13-logo5.dat",
-            "stud15-logo3.dat", "stud15-logo4.dat", "stud15-logo5.dat",
-            "stud20-logo3.dat", "stud20-logo4.dat", "stud20-logo5.dat",
-            "studa-logo3.dat",  "studa-logo4.dat",  "studa-logo5.dat",
-            "studtente-logo.dat"    # TENTE
-             )
+        # Stud logos count as studs too
+        return name in LDrawFile.__studNames or name in LDrawFile.__studLogoNames
 
     def __isStudLogo(filename):
         """Is this file a stud logo?"""
@@ -1540,7 +1616,7 @@ class LDrawFile:
         filename = filename.replace("\\", os.path.sep)
         name = os.path.basename(filename).lower()
 
-        return name in ("logo3.dat", "logo4.dat", "logo5.dat", "logotente.dat")
+        return name in LDrawFile.__studLogoNames
 
     def __init__(self, filename, isFullFilepath, parentFilepath, lines = None, isSubPart=False):
         """Loads an LDraw file (IO, LDR, L3B, DAT or MPD)"""
@@ -1581,18 +1657,21 @@ class LDrawFile:
 
         currentGroupNames = []
 
+        # Coordinates are converted from LDraw units to Blender units by this factor
+        scale = globalScaleFactor
+
         #debugPrint("Processing file {0}, isSubPart = {1}, found {2} lines".format(self.filename, self.isSubPart, len(self.lines)))
 
         for line in self.lines:
-            parameters = line.strip().split()
+            parameters = line.split()
 
             # Skip empty lines
             if len(parameters) == 0:
                 continue
 
             # Pad with empty values to simplify parsing code
-            while len(parameters) < 9:
-                parameters.append("")
+            if len(parameters) < 9:
+                parameters.extend([""] * (9 - len(parameters)))
 
             # Parse LDraw comments (some of which have special significance)
             if parameters[0] == "0":
@@ -1607,76 +1686,80 @@ class LDrawFile:
                     #if 'shortcut' in partType:
                     #    self.isPart = True
 
-                if parameters[1] == "BFC":
+                elif parameters[1] == "BFC":
                     # If unsure about being certified yet...
                     if self.bfcCertified is None:
                         if parameters[2] == "NOCERTIFY":
                             self.bfcCertified = False
                         else:
                             self.bfcCertified = True
-                    if "CW" in parameters:
+                    bfcOptions = frozenset(parameters[2:])
+                    if "CW" in bfcOptions:
                         bfcWindingCCW = False
-                    if "CCW" in parameters:
+                    if "CCW" in bfcOptions:
                         bfcWindingCCW = True
-                    if "CLIP" in parameters:
+                    if "CLIP" in bfcOptions:
                         bfcLocalCull = True
-                    if "NOCLIP" in parameters:
+                    if "NOCLIP" in bfcOptions:
                         bfcLocalCull = False
-                    if "INVERTNEXT" in parameters:
+                    if "INVERTNEXT" in bfcOptions:
                         bfcInvertNext = True
-                if parameters[1] == "SYNTH":
+                elif parameters[1] == "SYNTH":
                     if parameters[2] == "SYNTHESIZED":
                         if parameters[3] == "BEGIN":
                             processingLSynthParts = True
-                        if parameters[3] == "END":
+                        elif parameters[3] == "END":
                             processingLSynthParts = False
-                if parameters[1] == "!LDCAD":
+                elif parameters[1] == "!LDCAD":
                     if parameters[2] == "GENERATED":
                         processingLSynthParts = True
-                if parameters[1] == "!LEOCAD":
+                elif parameters[1] == "!LEOCAD":
                     if parameters[2] == "GROUP":
                         if parameters[3] == "BEGIN":
                             currentGroupNames.append(" ".join(parameters[4:]))
                         elif parameters[3] == "END":
                             currentGroupNames.pop(-1)
-                    if parameters[2] == "CAMERA":
+                    elif parameters[2] == "CAMERA":
                         if Options.importCameras:
-                            parameters = parameters[3:]
-                            while( len(parameters) > 0):
-                                if parameters[0] == "FOV":
-                                    camera.vert_fov_degrees = float(parameters[1])
-                                    parameters = parameters[2:]
-                                elif parameters[0] == "ZNEAR":
-                                    camera.near = globalScaleFactor * float(parameters[1])
-                                    parameters = parameters[2:]
-                                elif parameters[0] == "ZFAR":
-                                    camera.far = globalScaleFactor * float(parameters[1])
-                                    parameters = parameters[2:]
-                                elif parameters[0] == "POSITION":
-                                    camera.position = Math.scaleMatrix @ mathutils.Vector((float(parameters[1]), float(parameters[2]), float(parameters[3])))
-                                    parameters = parameters[4:]
-                                elif parameters[0] == "TARGET_POSITION":
-                                    camera.target_position = Math.scaleMatrix @ mathutils.Vector((float(parameters[1]), float(parameters[2]), float(parameters[3])))
-                                    parameters = parameters[4:]
-                                elif parameters[0] == "UP_VECTOR":
-                                    camera.up_vector = mathutils.Vector((float(parameters[1]), float(parameters[2]), float(parameters[3])))
-                                    parameters = parameters[4:]
-                                elif parameters[0] == "ORTHOGRAPHIC":
+                            # Walk the camera parameters by index rather than re-slicing the list
+                            index = 3
+                            count = len(parameters)
+                            while index < count:
+                                keyword = parameters[index]
+                                if keyword == "FOV":
+                                    camera.vert_fov_degrees = float(parameters[index + 1])
+                                    index += 2
+                                elif keyword == "ZNEAR":
+                                    camera.near = scale * float(parameters[index + 1])
+                                    index += 2
+                                elif keyword == "ZFAR":
+                                    camera.far = scale * float(parameters[index + 1])
+                                    index += 2
+                                elif keyword == "POSITION":
+                                    camera.position = mathutils.Vector((scale * float(parameters[index + 1]), scale * float(parameters[index + 2]), scale * float(parameters[index + 3])))
+                                    index += 4
+                                elif keyword == "TARGET_POSITION":
+                                    camera.target_position = mathutils.Vector((scale * float(parameters[index + 1]), scale * float(parameters[index + 2]), scale * float(parameters[index + 3])))
+                                    index += 4
+                                elif keyword == "UP_VECTOR":
+                                    camera.up_vector = mathutils.Vector((float(parameters[index + 1]), float(parameters[index + 2]), float(parameters[index + 3])))
+                                    index += 4
+                                elif keyword == "ORTHOGRAPHIC":
                                     camera.orthographic = True
-                                    parameters = parameters[1:]
-                                elif parameters[0] == "HIDDEN":
+                                    index += 1
+                                elif keyword == "HIDDEN":
                                     camera.hidden = True
-                                    parameters = parameters[1:]
-                                elif parameters[0] == "NAME":
+                                    index += 1
+                                elif keyword == "NAME":
                                     camera.name = line.split(" NAME ",1)[1].strip()
 
                                     globalCamerasToAdd.append(camera)
                                     camera = LDrawCamera()
 
                                     # By definition this is the last of the parameters
-                                    parameters = []
+                                    index = count
                                 else:
-                                    parameters = parameters[1:]
+                                    index += 1
 
 
             else:
@@ -1685,11 +1768,23 @@ class LDrawFile:
 
                 self.isModel = (not self.isPart) and (not self.isSubPart)
 
+                command = parameters[0]
+
+                # Parse a Face (either a triangle or a quadrilateral), the most common line type
+                if command == "3" or command == "4":
+                    if not self.isDoubleSided and (not self.bfcCertified or not bfcLocalCull):
+                        printWarningOnce("Found double-sided polygons in file {0}".format(self.filename))
+                        self.isDoubleSided = True
+
+                    assert len(self.geometry.faces) == len(self.geometry.faceColours)
+                    self.geometry.parseFace(parameters, self.bfcCertified and bfcLocalCull, bfcWindingCCW, isGrainySlopeAllowed)
+                    assert len(self.geometry.faces) == len(self.geometry.faceColours)
+
                 # Parse a File reference
-                if parameters[0] == "1":
+                elif command == "1":
                     (x, y, z, a, b, c, d, e, f, g, h, i) = map(float, parameters[2:14])
-                    (x, y, z) = Math.scaleMatrix @ mathutils.Vector((x, y, z))
-                    localMatrix = mathutils.Matrix( ((a, b, c, x), (d, e, f, y), (g, h, i, z), (0, 0, 0, 1)) )
+
+                    localMatrix = mathutils.Matrix( ((a, b, c, scale * x), (d, e, f, scale * y), (g, h, i, scale * z), (0, 0, 0, 1)) )
 
                     new_filename = " ".join(parameters[14:])
                     new_colourName = parameters[1]
@@ -1706,21 +1801,9 @@ class LDrawFile:
                         printWarningOnce("In file '{0}', the line '{1}' is not formatted corectly (ignoring).".format(self.fullFilepath, line))
 
                 # Parse an edge
-                elif parameters[0] == "2":
+                elif command == "2":
                     self.geometry.parseEdge(parameters)
 
-                # Parse a Face (either a triangle or a quadrilateral)
-                elif parameters[0] == "3" or parameters[0] == "4":
-                    if self.bfcCertified is None:
-                        self.bfcCertified = False
-                    if not self.bfcCertified or not bfcLocalCull:
-                        printWarningOnce("Found double-sided polygons in file {0}".format(self.filename))
-                        self.isDoubleSided = True
-
-                    assert len(self.geometry.faces) == len(self.geometry.faceInfo)
-                    self.geometry.parseFace(parameters, self.bfcCertified and bfcLocalCull, bfcWindingCCW, isGrainySlopeAllowed)
-                    assert len(self.geometry.faces) == len(self.geometry.faceInfo)
-
                 bfcInvertNext = False
 
         #debugPrint("File {0} is part = {1}, is subPart = {2}, isModel = {3}".format(filename, self.isPart, isSubPart, self.isModel))
@@ -1732,10 +1815,10 @@ class BlenderMaterials:
     """Creates and stores a cache of materials for Blender"""
 
     __material_list = {}
-    if bpy.app.version >= (4, 0, 0):
+    if isBlender4:
         __hasPrincipledShader = True
     else:
-        __hasPrincipledShader = "ShaderNodeBsdfPrincipled" in [node.nodetype for node in getattr(bpy.types, "NODE_MT_category_SH_NEW_SHADER").category.items(None)]
+        __hasPrincipledShader = any(node.nodetype == "ShaderNodeBsdfPrincipled" for node in getattr(bpy.types, "NODE_MT_category_SH_NEW_SHADER").category.items(None))
 
     def __getGroupName(name):
         if Options.instructionsLook:
@@ -1811,105 +1894,12 @@ class BlenderMaterials:
         material["Lego.isTransparent"] = False
         return material
 
-    def __nodeConcaveWalls(nodes, strength, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Concave Walls')]
-        node.location = x, y
-        node.inputs['Strength'].default_value = strength
-        return node
-
-    def __nodeSlopeTexture(nodes, strength, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Slope Texture')]
-        node.location = x, y
-        node.inputs['Strength'].default_value = strength
-        return node
-
-    def __nodeLegoStandard(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Standard')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoTransparentFluorescent(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Transparent Fluorescent')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoTransparent(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Transparent')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoRubberSolid(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Rubber Solid')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoRubberTranslucent(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Rubber Translucent')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoEmission(nodes, colour, luminance, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Emission')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        node.inputs['Luminance'].default_value = luminance
-        return node
-
-    def __nodeLegoChrome(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Chrome')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoPearlescent(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Pearlescent')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoMetal(nodes, colour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Metal')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        return node
-
-    def __nodeLegoGlitter(nodes, colour, glitterColour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Glitter')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        node.inputs['Glitter Color'].default_value = glitterColour
-        return node
-
-    def __nodeLegoSpeckle(nodes, colour, speckleColour, x, y):
-        node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Speckle')]
-        node.location = x, y
-        node.inputs['Color'].default_value = colour
-        node.inputs['Speckle Color'].default_value = speckleColour
-        return node
-
-    def __nodeLegoMilkyWhite(nodes, colour, x, y):
+    def __nodeGroup(nodes, name, x, y, inputs):
         node = nodes.new('ShaderNodeGroup')
-        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName('Lego Milky White')]
+        node.node_tree = bpy.data.node_groups[BlenderMaterials.__getGroupName(name)]
         node.location = x, y
-        node.inputs['Color'].default_value = colour
+        for (inputName, value) in inputs:
+            node.inputs[inputName].default_value = value
         return node
 
     def __nodeMix(nodes, factor, x, y):
@@ -1938,7 +1928,7 @@ class BlenderMaterials:
         node.location = x, y
 
         # Some inputs are renamed in Blender 4
-        if bpy.app.version >= (4, 0, 0):
+        if isBlender4:
             node.inputs['Subsurface Weight'].default_value = subsurface
             node.inputs['Coat Weight'].default_value = clearcoat
             node.inputs['Coat Roughness'].default_value = clearcoat_roughness
@@ -2115,14 +2105,14 @@ class BlenderMaterials:
 
     def __createCyclesConcaveWalls(nodes, links, strength):
         """Concave wall normals for Cycles render engine"""
-        node = BlenderMaterials.__nodeConcaveWalls(nodes, strength, -200, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Concave Walls', -200, 5, (('Strength', strength),))
         out = BlenderMaterials.__getGroup(nodes)
         if out is not None:
             links.new(node.outputs['Normal'], out.inputs['Normal'])
 
     def __createCyclesSlopeTexture(nodes, links, strength):
         """Slope face normals for Cycles render engine"""
-        node = BlenderMaterials.__nodeSlopeTexture(nodes, strength, -200, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Slope Texture', -200, 5, (('Strength', strength),))
         out = BlenderMaterials.__getGroup(nodes)
         if out is not None:
             links.new(node.outputs['Normal'], out.inputs['Normal'])
@@ -2132,11 +2122,11 @@ class BlenderMaterials:
 
         if alpha < 1:
             if LegoColours.isFluorescentTransparent(colName):
-                node = BlenderMaterials.__nodeLegoTransparentFluorescent(nodes, diffColour, 0, 5)
+                node = BlenderMaterials.__nodeGroup(nodes, 'Lego Transparent Fluorescent', 0, 5, (('Color', diffColour),))
             else:
-                node = BlenderMaterials.__nodeLegoTransparent(nodes, diffColour, 0, 5)
+                node = BlenderMaterials.__nodeGroup(nodes, 'Lego Transparent', 0, 5, (('Color', diffColour),))
         else:
-            node = BlenderMaterials.__nodeLegoStandard(nodes, diffColour, 0, 5)
+            node = BlenderMaterials.__nodeGroup(nodes, 'Lego Standard', 0, 5, (('Color', diffColour),))
 
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
@@ -2144,28 +2134,28 @@ class BlenderMaterials:
     def __createCyclesEmission(nodes, links, diffColour, alpha, luminance):
         """Emission material for Cycles render engine."""
 
-        node = BlenderMaterials.__nodeLegoEmission(nodes, diffColour, luminance/100.0, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Emission', 0, 5, (('Color', diffColour), ('Luminance', luminance/100.0)))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
     def __createCyclesChrome(nodes, links, diffColour):
         """Chrome material for Cycles render engine."""
 
-        node = BlenderMaterials.__nodeLegoChrome(nodes, diffColour, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Chrome', 0, 5, (('Color', diffColour),))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
     def __createCyclesPearlescent(nodes, links, diffColour):
         """Pearlescent material for Cycles render engine."""
 
-        node = BlenderMaterials.__nodeLegoPearlescent(nodes, diffColour, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Pearlescent', 0, 5, (('Color', diffColour),))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
     def __createCyclesMetal(nodes, links, diffColour):
         """Metal material for Cycles render engine."""
 
-        node = BlenderMaterials.__nodeLegoMetal(nodes, diffColour, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Metal', 0, 5, (('Color', diffColour),))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
@@ -2173,7 +2163,7 @@ class BlenderMaterials:
         """Glitter material for Cycles render engine."""
 
         glitterColour = LegoColours.lightenRGBA(glitterColour, 0.5)
-        node = BlenderMaterials.__nodeLegoGlitter(nodes, diffColour, glitterColour, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Glitter', 0, 5, (('Color', diffColour), ('Glitter Color', glitterColour)))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
@@ -2181,7 +2171,7 @@ class BlenderMaterials:
         """Speckle material for Cycles render engine."""
 
         speckleColour = LegoColours.lightenRGBA(speckleColour, 0.5)
-        node = BlenderMaterials.__nodeLegoSpeckle(nodes, diffColour, speckleColour, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Speckle', 0, 5, (('Color', diffColour), ('Speckle Color', speckleColour)))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
@@ -2191,25 +2181,24 @@ class BlenderMaterials:
         out    = BlenderMaterials.__nodeOutput(nodes, 200, 0)
 
         if alpha < 1.0:
-            rubber = BlenderMaterials.__nodeLegoRubberTranslucent(nodes, diffColour, 0, 5)
+            rubber = BlenderMaterials.__nodeGroup(nodes, 'Lego Rubber Translucent', 0, 5, (('Color', diffColour),))
         else:
-            rubber = BlenderMaterials.__nodeLegoRubberSolid(nodes, diffColour, 0, 5)
+            rubber = BlenderMaterials.__nodeGroup(nodes, 'Lego Rubber Solid', 0, 5, (('Color', diffColour),))
 
         links.new(rubber.outputs[0], out.inputs[0])
 
     def __createCyclesMilkyWhite(nodes, links, diffColour):
         """Milky White material for Cycles render engine."""
 
-        node = BlenderMaterials.__nodeLegoMilkyWhite(nodes, diffColour, 0, 5)
+        node = BlenderMaterials.__nodeGroup(nodes, 'Lego Milky White', 0, 5, (('Color', diffColour),))
         out = BlenderMaterials.__nodeOutput(nodes, 200, 0)
         links.new(node.outputs['Shader'], out.inputs[0])
 
     def __is_int(s):
-        try:
-            int(s)
-            return True
-        except ValueError:
-            return False
+        # Test the digits directly rather than raising and catching a ValueError
+        if s[:1] in ("-", "+"):
+            s = s[1:]
+        return s.isdecimal()
 
     def __getColourData(colourName):
         """Get the colour data associated with the colour name"""
@@ -2255,8 +2244,10 @@ class BlenderMaterials:
 
         # If the name already exists in Blender, use that
         if Options.overwriteExistingMaterials is False:
-            if blenderName in bpy.data.materials:
-                return bpy.data.materials[blenderName]
+            material = bpy.data.materials.get(blenderName)
+            if material is not None:
+                BlenderMaterials.__material_list[colourName] = material
+                return material
 
         # Create new material
         col = BlenderMaterials.__getColourData(pureColourName)
@@ -2275,7 +2266,7 @@ class BlenderMaterials:
 
     # **********************************************************************************
     def addInputSocket(group, my_socket_type, myname):
-        if bpy.app.version >= (4, 0, 0):
+        if isBlender4:
             if my_socket_type.endswith("FloatFactor"):
                 my_socket_type = my_socket_type[:-6]
             elif my_socket_type.endswith("VectorDirection"):
@@ -2288,7 +2279,7 @@ class BlenderMaterials:
 
     # **********************************************************************************
     def addOutputSocket(group, my_socket_type, myname):
-        if bpy.app.version >= (4, 0, 0):
+        if isBlender4:
             if my_socket_type.endswith("FloatFactor"):
                 my_socket_type = my_socket_type[:-6]
             elif my_socket_type.endswith("VectorDirection"):
@@ -2301,7 +2292,7 @@ class BlenderMaterials:
 
     # **********************************************************************************
     def setDefaults(group, name, default_value, min_value, max_value):
-        if bpy.app.version >= (4, 0, 0):
+        if isBlender4:
             group_inputs = group.nodes["Group Input"].outputs
             group_inputs[name].default_value = default_value
             # TODO: How to set min_value and max_value?
@@ -3204,7 +3195,7 @@ def addSharpEdges(bm, geometry, filename):
                 meshEdge.smooth = False
 
         # Set bevel weights
-        if bpy.app.version < (4, 0, 0):
+        if not isBlender4:
             # Blender 3
             # Find layer for bevel weights
             if 'BevelWeight' in bm.edges.layers.bevel_weight:
@@ -3307,8 +3298,8 @@ def meshIsReusable(meshName, geometry):
         if 'customMeshOptions' in mesh.keys():
             #debugPrint("meshIsReusable found custom options.")
             #debugPrint("mesh['customMeshOptions'] = {0}".format(mesh['customMeshOptions']))
-            #debugPrint("Options.meshOptionsString() = {0}".format(Options.meshOptionsString()))
-            if mesh['customMeshOptions'] == Options.meshOptionsString():
+            #debugPrint("globalMeshOptions = {0}".format(globalMeshOptions))
+            if mesh['customMeshOptions'] == globalMeshOptions:
                 #debugPrint("meshIsReusable found custom options - match OK.")
                 return True
             #debugPrint("meshIsReusable found custom options - DON'T match.")
@@ -3594,11 +3585,10 @@ def slopeAnglesForPart(partName):
         partNumberWithoutLetter = match.group(1)
         partNumberWithLetter = partNumberWithoutLetter + match.group(2)
 
-        if partNumberWithLetter in globalSlopeAngles:
-            return globalSlopeAngles[partNumberWithLetter]
-
-        if partNumberWithoutLetter in globalSlopeAngles:
-            return globalSlopeAngles[partNumberWithoutLetter]
+        slopeAngles = globalSlopeAngles.get(partNumberWithLetter)
+        if slopeAngles is None:
+            slopeAngles = globalSlopeAngles.get(partNumberWithoutLetter)
+        return slopeAngles
 
     return None
 
@@ -3625,7 +3615,10 @@ def isSlopeFace(slopeAngles, isGrainySlopeAllowed, faceVertices):
     # debugPrint("Angle to ground {0}".format(angleToGroundDegrees))
 
     # Step 3: Check angle of normal to ground is within one of the acceptable ranges for this part
-    return any(c[0] <= angleToGroundDegrees <= c[1] for c in slopeAngles)
+    for (minAngle, maxAngle) in slopeAngles:
+        if minAngle <= angleToGroundDegrees <= maxAngle:
+            return True
+    return False
 
 # **************************************************************************************
 def createMesh(name, meshName, geometry):
@@ -3656,21 +3649,20 @@ def createMesh(name, meshName, geometry):
 
             # Set a custom parameter to record the options used to create this mesh
             # Used for caching.
-            mesh['customMeshOptions'] = Options.meshOptionsString()
+            mesh['customMeshOptions'] = globalMeshOptions
 
             newMeshCreated = True
 
         # Create materials and assign material to each polygon
         if mesh.users == 0:
             assert len(mesh.polygons) == len(geometry.faces)
-            assert len(geometry.faces) == len(geometry.faceInfo)
+            assert len(geometry.faces) == len(geometry.faceColours)
 
             slopeAngles = slopeAnglesForPart(name)
             isSloped = slopeAngles is not None
             for i, f in enumerate(mesh.polygons):
-                faceInfo = geometry.faceInfo[i]
-                isSlopeMaterial = isSloped and isSlopeFace(slopeAngles, faceInfo.isGrainySlopeAllowed, [geometry.points[j] for j in geometry.faces[i]])
-                faceColour = faceInfo.faceColour
+                isSlopeMaterial = isSloped and isSlopeFace(slopeAngles, geometry.faceGrainySlopeAllowed[i], [geometry.points[j] for j in geometry.faces[i]])
+                faceColour = geometry.faceColours[i]
                 # For debugging purposes, we can make sloped faces blue:
                 # if isSlopeMaterial:
                 #     faceColour = "1"
@@ -3787,7 +3779,7 @@ def createBlenderObjectsFromNode(node,
             if hasattr(ob.data, "use_customdata_edge_bevel"):
                 ob.data.use_customdata_edge_bevel = True
             else:
-                if bpy.app.version < (4, 0, 0):
+                if not isBlender4:
                     # Add to scene
                     linkToScene(ob)
 
@@ -3817,8 +3809,8 @@ def createBlenderObjectsFromNode(node,
         # Mark object as transparent if any polygon is transparent
         ob["Lego.isTransparent"] = False
         if mesh is not None:
-            for faceInfo in geometry.faceInfo:
-                material = BlenderMaterials.getMaterial(faceInfo.faceColour, False)
+            for faceColour in geometry.faceColours:
+                material = BlenderMaterials.getMaterial(faceColour, False)
                 if material is not None:
                     if "Lego.isTransparent" in material:
                         if material["Lego.isTransparent"]:
@@ -3884,7 +3876,7 @@ def createBlenderObjectsFromNode(node,
             bm.to_mesh(ob.data)
 
             # In Blender 4, set the edge weights (on ob.data rather than bm these days)
-            if (bpy.app.version >= (4, 0, 0)) and edgeIndices:
+            if isBlender4 and edgeIndices:
                 # Blender 4
                 bevel_weight_attr = ob.data.attributes.new("bevel_weight_edge", "FLOAT", "EDGE")
                 for idx, meshEdge in enumerate(bm.edges):
@@ -4124,6 +4116,7 @@ def removeCollection(name, remove_collection_objects=False):
             while obs:
                 bpy.data.objects.remove(obs.pop())
 
+        globalCollectionObjectNames.clear()
         bpy.data.collections.remove(coll)
 
 # **************************************************************************************
@@ -4331,7 +4324,7 @@ def setupInstructionsLook():
     links.new(zCombine.outputs[0], composite.inputs[0])
 
     # Blender 3 only: link the Z from the Z Combine to the composite. This is not present in Blender 4.
-    if bpy.app.version < (4, 0, 0):
+    if not isBlender4:
         links.new(zCombine.outputs[1], composite.inputs[2])
 
 
@@ -4484,6 +4477,7 @@ def loadFromFile(context, filename, isFullFilepath=True):
     global globalCamerasToAdd
     global globalContext
     global globalScaleFactor
+    global globalMeshOptions
 
     # Set global scale factor
     # -----------------------
@@ -4525,7 +4519,9 @@ def loadFromFile(context, filename, isFullFilepath=True):
     # and the colours derived from that.
     Configure()
     LegoColours()
-    Math()
+
+    # The options don't change during an import, so build the mesh cache key once
+    globalMeshOptions = Options.meshOptionsString()
 
     if Configure.ldrawInstallDirectory == "":
         printError("Could not find LDraw Part Library")
@@ -4533,10 +4529,12 @@ def loadFromFile(context, filename, isFullFilepath=True):
 
     # Clear caches
     CachedDirectoryFilenames.clearCache()
+    CachedPathExists.clearCache()
     CachedFiles.clearCache()
     CachedGeometry.clearCache()
     BlenderMaterials.clearCache()
     Configure.warningSuppression = {}
+    globalCollectionObjectNames.clear()
 
     if Options.useLogoStuds:
         debugPrint("Loading stud files")
@@ -4698,8 +4696,7 @@ def loadFromFile(context, filename, isFullFilepath=True):
 
     # Finally add each object to the scene
     debugPrint("Adding {0} objects to scene".format(len(globalObjectsToAdd)))
-    for ob in globalObjectsToAdd:
-        linkToScene(ob)
+    linkManyToScene(globalObjectsToAdd)
 
     # Parent only once everything has been added to the scene, otherwise the matrix_world's are
     # sometimes not updated properly - some are erroneously still the identity matrix.
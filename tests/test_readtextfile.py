@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# loadldraw needs Blender's Python modules
+pytest.importorskip("bpy")
+pytest.importorskip("mathutils")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "loadldraw"))
+import loadldraw
+
+
+def test_comment_with_unicode_line_breaks_stays_one_line(tmp_path):
+    # b"\x85" is a cp1252 ellipsis; it is not valid UTF-8, so the file is read as Latin 1
+    filepath = tmp_path / "part.dat"
+    filepath.write_bytes(b"0 Name: part\x85 with ellipsis\r\n"
+                         b"0 Author: form\x0cfeed\r\n"
+                         b"0 BFC CERTIFY CCW\n"
+                         b"3 16 0 0 0 1 0 0 0 1 0\n")
+
+    lines = loadldraw.FileSystem.readTextFile(str(filepath))
+
+    assert len(lines) == 4
+    assert lines[0] == "0 Name: part\x85 with ellipsis\n"
+    assert lines[1] == "0 Author: form\x0cfeed\n"
+    assert lines[3].startswith("3 16")